@@ -27,3 +27,15 @@ def loss_loa(data1, data2):
     md = np.mean(diff)
     sd = np.std(diff, axis=0)
     return (md - 1.96 * sd, md + 1.96 * sd)
+
+def fold_report(results):
+    lines = ["fold repeat       seed    mae      e    pcc              loa"]
+    for r in results:
+        lines.append("{:4d} {:6d} {:10d} {:6.2f} {:6.3f} {:6.3f} ({:6.2f}, {:6.2f})".format(
+            r["fold"], r["repeat"], int(r["seed"]), r["mae"], r["e"], r["pcc"], r["loa"][0], r["loa"][1]))
+    for name in ("mae", "e", "pcc"):
+        values = np.array([r[name] for r in results], dtype=float)
+        lines.append("{} mean={:.3f} std={:.3f}".format(name, np.mean(values), np.std(values)))
+    loa = np.array([r["loa"] for r in results], dtype=float)
+    lines.append("loa mean=({:.2f}, {:.2f})".format(np.mean(loa[:, 0]), np.mean(loa[:, 1])))
+    return "\n".join(lines)
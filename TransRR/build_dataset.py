@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+import os
+import glob
+import argparse
+import multiprocessing
+from fractions import Fraction
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from scipy.signal import butter, resample_poly, sosfiltfilt
+from preprocessing import FS, LOW_CUT, HIGH_CUT, FILTER_ORDER, StreamingBandpass, sliding_windows
+from vmd import vmd_remove_last, vmd_remove_last_windows
+from dataset_cache import cache_paths
+
+# Build the training csv read by rrp.py (rows: subject id, x1 ECG window, x2 PPG window, RR)
+# from raw per-subject records. The default follows the README order, so existing csv files
+# can be regenerated (e.g. for another window length or hop):
+#   resample to 125 Hz -> zero-phase band-pass (sosfiltfilt) -> VMD of the whole record
+#   (drop the last mode) -> subject z-score -> windows -> RR screen
+# --live-order builds windows the way a live stream sees them instead:
+#   resample -> causal band-pass (the live StreamingBandpass) -> windows -> RR screen
+#   -> VMD per kept window -> subject z-score over the kept windows
+# The two orders do not give the same windows, and per-window VMD is much slower.
+# The .npy/_id.npy cache of load_csv is written next to the csv.
+#
+#   python build_dataset.py bidmc_csv/ data/ --dataset bidmc --win-sec 16 --overlap 0.875
+#
+# Inputs:
+#   bidmc  bidmc_XX_Signals.csv (columns II, PLETH) + bidmc_XX_Numerics.csv (column RESP, 1 Hz)
+#   npz    <subject>.npz with ecg, ppg, fs (or ecg_fs/ppg_fs), rr_t, rr; use this for CapnoBase
+#          or any other source after extracting the arrays
+
+MIN_RR = 5
+MAX_RR = 30
+
+def _column(df, name):
+    columns = {c.strip().upper(): c for c in df.columns}
+    return df[columns[name.upper()]].to_numpy(dtype=float)
+
+def load_bidmc(signals_path):
+    subject = os.path.basename(signals_path).split("_")[1]
+    signals = pd.read_csv(signals_path)
+    numerics = pd.read_csv(signals_path.replace("_Signals.csv", "_Numerics.csv"))
+    t = _column(signals, "Time [s]")
+    fs = round(1 / np.median(np.diff(t)))
+    return {"subject": subject, "ecg": _column(signals, "II"), "ppg": _column(signals, "PLETH"),
+            "ecg_fs": fs, "ppg_fs": fs, "rr_t": _column(numerics, "Time [s]"), "rr": _column(numerics, "RESP")}
+
+def load_npz(path):
+    with np.load(path) as f:
+        record = {k: f[k] for k in f.files}
+    fs = record.pop("fs", None)
+    record.setdefault("ecg_fs", fs)
+    record.setdefault("ppg_fs", fs)
+    record["subject"] = os.path.splitext(os.path.basename(path))[0]
+    return record
+
+LOADERS = {
+    "bidmc": ("*_Signals.csv", load_bidmc),
+    "npz": ("*.npz", load_npz),
+}
+
+def resample(x, fs_in, fs_out=FS):
+    if fs_in == fs_out:
+        return np.asarray(x, dtype=float)
+    ratio = Fraction(fs_out / fs_in).limit_denominator(1000)
+    return resample_poly(x, ratio.numerator, ratio.denominator)
+
+# Mean RR over every window: the labels are interpolated onto the sample grid and averaged
+# with a cumulative sum, so all windows are labelled at once.
+def window_labels(rr_t, rr, n, win_size, hop_size, fs=FS):
+    valid = np.isfinite(rr_t) & np.isfinite(rr)
+    if not valid.any():
+        return np.full(len(range(0, n - win_size + 1, hop_size)), np.nan)
+    per_sample = np.interp(np.arange(n) / fs, rr_t[valid], rr[valid])
+    c = np.concatenate([[0.0], np.cumsum(per_sample)])
+    starts = np.arange(0, n - win_size + 1, hop_size)
+    return (c[starts + win_size] - c[starts]) / win_size
+
+def _zscore(x, axis):
+    mean = x.mean(axis=axis, keepdims=True)
+    std = x.std(axis=axis, keepdims=True)
+    return (x - mean) / np.where(std > 0, std, 1)
+
+# zero_phase=None uses sosfiltfilt for the README order and the causal live filter for live_order
+def build_subject(record, win_size=16 * FS, hop_size=2 * FS, K=4, use_vmd=True, live_order=False, zero_phase=None,
+                  min_rr=MIN_RR, max_rr=MAX_RR):
+    if zero_phase is None:
+        zero_phase = not live_order
+    ecg = resample(record["ecg"], record["ecg_fs"])
+    ppg = resample(record["ppg"], record["ppg_fs"])
+    n = min(len(ecg), len(ppg))
+    if n < win_size:
+        return record["subject"], np.empty((0, 2 * win_size + 1), dtype=np.float32)
+    x = np.stack([ecg[:n], ppg[:n]])
+    x = np.nan_to_num(x - np.nanmean(x, axis=1, keepdims=True))  # BIDMC has a few missing samples
+    if zero_phase:
+        x = sosfiltfilt(butter(FILTER_ORDER, [LOW_CUT, HIGH_CUT], btype='bandpass', fs=FS, output='sos'), x, axis=1)
+    else:
+        x = np.stack([StreamingBandpass().process(channel) for channel in x])  # same filter as the live GUI
+
+    rr = window_labels(np.asarray(record["rr_t"], dtype=float), np.asarray(record["rr"], dtype=float),
+                       n, win_size, hop_size)
+    keep = (rr > min_rr) & (rr < max_rr)
+    if not keep.any():
+        return record["subject"], np.empty((0, 2 * win_size + 1), dtype=np.float32)
+
+    if not live_order:
+        # README order: both channels decomposed in one batched VMD call, z-scored over the whole record
+        if use_vmd:
+            x = vmd_remove_last(x, K=K)[0]
+        x = _zscore(x, axis=1)
+        windows = sliding_windows(x, win_size, hop_size)[:, keep]  # (2, n_kept, win_size)
+    else:
+        # windows are views (sliding_window_view), only the windows that pass the screen are copied
+        windows = sliding_windows(x, win_size, hop_size)[:, keep]
+        if use_vmd:
+            windows = np.stack([vmd_remove_last_windows(channel, K=K)[0] for channel in windows])
+        windows = _zscore(windows, axis=(1, 2))
+
+    rows = np.empty((keep.sum(), 2 * win_size + 1), dtype=np.float32)
+    rows[:, :win_size] = windows[0]
+    rows[:, win_size:2 * win_size] = windows[1]
+    rows[:, -1] = rr[keep]
+    return record["subject"], rows
+
+def _build_file(path, loader, kwargs):
+    return build_subject(LOADERS[loader][1](path), **kwargs)
+
+def default_name(dataset, win_sec, overlap, use_vmd=True):
+    return "{}_RR_{}s_overlap{:g}{}_zscore_RRscreen.csv".format(
+        dataset, win_sec, 100 * overlap, "_vmd" if use_vmd else "")
+
+# Process every subject in a worker process and write the rows in subject order.
+def build_dataset(input_dir, csv_path, dataset="bidmc", win_sec=16, overlap=0.875, K=4, use_vmd=True,
+                  live_order=False, zero_phase=None, workers=None, min_rr=MIN_RR, max_rr=MAX_RR):
+    pattern, _ = LOADERS[dataset]
+    paths = sorted(glob.glob(os.path.join(input_dir, pattern)))
+    if not paths:
+        raise FileNotFoundError("no {} files in {}".format(pattern, input_dir))
+    win_size = int(win_sec * FS)
+    hop_size = int(round(win_size * (1 - overlap)))
+    kwargs = dict(win_size=win_size, hop_size=hop_size, K=K, use_vmd=use_vmd, live_order=live_order,
+                  zero_phase=zero_phase, min_rr=min_rr, max_rr=max_rr)
+
+    ids, data = [], []
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as executor, open(csv_path, "w") as f:
+        for subject, rows in executor.map(_build_file, paths, [dataset] * len(paths), [kwargs] * len(paths)):
+            print("subject {}: {} windows".format(subject, len(rows)))
+            frame = pd.DataFrame(rows)
+            frame.insert(0, "id", subject)
+            frame.to_csv(f, header=False, index=False, float_format="%.9g")  # round-trips float32
+            ids.append(np.full(len(rows), subject))
+            data.append(rows)
+
+    # binary copy in the load_csv cache format (written after the csv, so the cache is fresh);
+    # the csv holds every float32 digit, so parsing it gives the same matrix as the cache
+    data_path, id_path = cache_paths(csv_path)
+    np.save(data_path, np.concatenate(data))
+    np.save(id_path, np.concatenate(ids))
+    print("{} rows from {} subjects -> {}".format(sum(len(d) for d in data), len(paths), csv_path))
+    return csv_path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build TransRR training windows from raw records")
+    parser.add_argument("input_dir")
+    parser.add_argument("output", help="csv path, or a directory for the default file name")
+    parser.add_argument("--dataset", choices=sorted(LOADERS), default="bidmc")
+    parser.add_argument("--win-sec", type=int, default=16)
+    parser.add_argument("--overlap", type=float, default=0.875)
+    parser.add_argument("--modes", type=int, default=4, help="number of VMD modes")
+    parser.add_argument("--no-vmd", action="store_true")
+    parser.add_argument("--live-order", action="store_true",
+                        help="window and screen before a per-window VMD, like the live stream (default: README order)")
+    parser.add_argument("--filter", choices=["zero-phase", "causal"], default=None,
+                        help="band-pass: zero-phase sosfiltfilt or the causal live filter "
+                             "(default: zero-phase, causal with --live-order)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--min-rr", type=float, default=MIN_RR)
+    parser.add_argument("--max-rr", type=float, default=MAX_RR)
+    args = parser.parse_args()
+
+    output = args.output
+    if os.path.isdir(output):
+        output = os.path.join(output, default_name(args.dataset, args.win_sec, args.overlap, not args.no_vmd))
+    zero_phase = None if args.filter is None else args.filter == "zero-phase"
+    build_dataset(args.input_dir, output, args.dataset, args.win_sec, args.overlap, args.modes, not args.no_vmd,
+                  args.live_order, zero_phase, args.workers, args.min_rr, args.max_rr)
@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+import os
+
+# Binary cache of a training csv written by build_dataset.py and read by make_dataset.load_csv:
+# <name>.npy holds the float32 matrix [x1, x2, rr], <name>_id.npy the patient ids.
+# Kept free of TensorFlow so the dataset builder and its worker processes stay light.
+def cache_paths(csv_path, cache_dir=None):
+    base = os.path.splitext(os.path.basename(csv_path))[0]
+    cache_dir = cache_dir or os.path.dirname(os.path.abspath(csv_path))
+    return os.path.join(cache_dir, base + ".npy"), os.path.join(cache_dir, base + "_id.npy")
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import tensorflow as tf
+from keras import optimizers
+from keras.callbacks import ReduceLROnPlateau, EarlyStopping
+from make_dataset import make_tf_dataset
+from model_profile import model_latency
+from Utils import loss_mae, loss_pcc
+
+# y_true is (batch, 2) = [label, teacher prediction]; the student is fitted to both
+def distillation_loss(alpha=0.5):
+    def loss(y_true, y_pred):
+        y_pred = tf.reshape(y_pred, [-1])
+        label_mae = tf.reduce_mean(tf.abs(y_true[:, 0] - y_pred))
+        teacher_mae = tf.reduce_mean(tf.abs(y_true[:, 1] - y_pred))
+        return alpha * label_mae + (1 - alpha) * teacher_mae
+    return loss
+
+# Train a compact student on the same fold split as the teacher, supervised by the labels
+# and by the teacher's predictions on the training/validation windows, then compare both
+# models on the test windows.
+def distill(teacher, student, data, train_index, val_index, test_index, win_size, down_sampling_grade=8,
+            batch_size=64, epochs=500, lr=0.001, alpha=0.5, verbose=1):
+    # teacher predictions, one per row of data
+    soft_targets = np.zeros(len(data), dtype=np.float32)
+    for index in (train_index, val_index):
+        ds = make_tf_dataset(data, index, win_size, down_sampling_grade, batch_size)
+        soft_targets[index] = teacher.predict(ds, verbose=0).squeeze()
+
+    train_ds = make_tf_dataset(data, train_index, win_size, down_sampling_grade, batch_size, shuffle=True,
+                               soft_targets=soft_targets)
+    val_ds = make_tf_dataset(data, val_index, win_size, down_sampling_grade, batch_size, soft_targets=soft_targets)
+    test_ds = make_tf_dataset(data, test_index, win_size, down_sampling_grade, batch_size)
+
+    reduce_lr = ReduceLROnPlateau(monitor='val_loss', factor=0.9, patience=5, mode='auto', min_lr=0.0001)
+    early_stop = EarlyStopping(monitor="val_loss", patience=20, verbose=0, mode="min")
+    student.compile(optimizer=optimizers.Adam(learning_rate=lr), loss=distillation_loss(alpha))
+    student.fit(train_ds, validation_data=val_ds, epochs=epochs, verbose=verbose, callbacks=[reduce_lr, early_stop])
+
+    rr_in_test = np.asarray(data[test_index, win_size*2], dtype=np.float32)
+    teacher_pred = teacher.predict(test_ds, verbose=0).squeeze()
+    student_pred = student.predict(test_ds, verbose=0).squeeze()
+    n = len(range(0, win_size, down_sampling_grade))
+    teacher_latency = model_latency(teacher, n)
+    student_latency = model_latency(student, n)
+    return {"teacher_mae": loss_mae(rr_in_test, teacher_pred), "student_mae": loss_mae(rr_in_test, student_pred),
+            "teacher_pcc": loss_pcc(rr_in_test, teacher_pred), "student_pcc": loss_pcc(rr_in_test, student_pred),
+            "teacher_params": teacher.count_params(), "student_params": student.count_params(),
+            "speedup": teacher_latency / student_latency}
+
+def distill_report(r):
+    return "\n".join([
+        "          params    mae    pcc",
+        "teacher {:8d} {:6.2f} {:6.3f}".format(r["teacher_params"], r["teacher_mae"], r["teacher_pcc"]),
+        "student {:8d} {:6.2f} {:6.3f}".format(r["student_params"], r["student_mae"], r["student_pcc"]),
+        "inference speedup: {:.2f}x".format(r["speedup"]),
+    ])
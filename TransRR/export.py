@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+import numpy as np
+import tensorflow as tf
+from make_dataset import make_tf_dataset
+from predictor import quantize, dequantize, input_order
+
+QUANTIZATIONS = ("float32", "dynamic", "fp16", "int8")
+
+def dataset_arrays(ds):
+    x1, x2, y = [], [], []
+    for (b1, b2), by in ds.as_numpy_iterator():
+        x1.append(b1)
+        x2.append(b2)
+        y.append(by)
+    return np.concatenate(x1), np.concatenate(x2), np.concatenate(y)
+
+# INT8 calibration data: a random subset of the (downsampled) training windows
+def representative_dataset(data, index, win_size, down_sampling_grade=8, num_samples=200, seed=0):
+    rng = np.random.default_rng(seed)
+    subset = np.sort(rng.choice(index, size=min(num_samples, len(index)), replace=False))
+    x1, x2, _ = dataset_arrays(make_tf_dataset(data, subset, win_size, down_sampling_grade, batch_size=1))
+
+    def generator():
+        for i in range(len(x1)):
+            yield [x1[i:i + 1], x2[i:i + 1]]
+    return generator
+
+def convert_tflite(saved_model_dir, quantization="float32", representative=None):
+    converter = tf.lite.TFLiteConverter.from_saved_model(saved_model_dir)
+    if quantization == "dynamic":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    elif quantization == "fp16":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization == "int8":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.int8
+        converter.inference_output_type = tf.int8
+        try:
+            return converter.convert()
+        except Exception as e:
+            # some attention ops have no int8 kernel; keep those in float
+            print("full int8 conversion failed ({}), falling back to int8 with float ops".format(e))
+            converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8, tf.lite.OpsSet.TFLITE_BUILTINS]
+            converter.inference_input_type = tf.float32
+            converter.inference_output_type = tf.float32
+    elif quantization != "float32":
+        raise ValueError("unknown quantization: " + quantization)
+    return converter.convert()
+
+# Run a TFLite flatbuffer window by window; returns predictions and the median latency (s)
+def tflite_predict(tflite_model, x1, x2):
+    interpreter = tf.lite.Interpreter(model_content=tflite_model)
+    interpreter.allocate_tensors()
+    inputs = input_order(interpreter.get_input_details())
+    output = interpreter.get_output_details()[0]
+    predictions = np.empty(len(x1), dtype=np.float32)
+    latencies = np.empty(len(x1))
+    for i in range(len(x1)):
+        start = time.perf_counter()
+        interpreter.set_tensor(inputs[0]["index"], quantize(x1[i:i + 1], inputs[0]))
+        interpreter.set_tensor(inputs[1]["index"], quantize(x2[i:i + 1], inputs[1]))
+        interpreter.invoke()
+        predictions[i] = dequantize(interpreter.get_tensor(output["index"]), output).squeeze()
+        latencies[i] = time.perf_counter() - start
+    return predictions, float(np.median(latencies))
+
+def keras_latency(model, x1, x2, runs=50):
+    latencies = []
+    for i in range(min(runs, len(x1))):
+        start = time.perf_counter()
+        model([x1[i:i + 1], x2[i:i + 1]], training=False)
+        latencies.append(time.perf_counter() - start)
+    return float(np.median(latencies))
+
+# Write a SavedModel (+ .keras file for the GUI) and one TFLite flatbuffer per quantization
+# into out_dir, then compare size, single-window CPU latency and test MAE with the float model.
+def export_model(model, out_dir, test_ds, representative=None, quantizations=QUANTIZATIONS):
+    os.makedirs(out_dir, exist_ok=True)
+    saved_model_dir = os.path.join(out_dir, "saved_model")
+    if hasattr(model, "export"):
+        model.export(saved_model_dir)
+    else:
+        tf.saved_model.save(model, saved_model_dir)
+    model.save(os.path.join(out_dir, "transrr.keras"))
+
+    x1, x2, y = dataset_arrays(test_ds)
+    keras_pred = model.predict(test_ds, verbose=0).squeeze()
+    keras_mae = float(np.mean(np.abs(y - keras_pred)))
+    report = [{"model": "keras", "size_kb": None, "latency_ms": 1000 * keras_latency(model, x1, x2),
+               "mae": keras_mae, "mae_delta": 0.0}]
+    for quantization in quantizations:
+        if quantization == "int8" and representative is None:
+            print("skip int8: no representative dataset")
+            continue
+        tflite_model = convert_tflite(saved_model_dir, quantization, representative)
+        path = os.path.join(out_dir, "transrr_{}.tflite".format(quantization))
+        with open(path, "wb") as f:
+            f.write(tflite_model)
+        pred, latency = tflite_predict(tflite_model, x1, x2)
+        mae = float(np.mean(np.abs(y - pred)))
+        report.append({"model": quantization, "size_kb": len(tflite_model) / 1024, "latency_ms": 1000 * latency,
+                       "mae": mae, "mae_delta": mae - keras_mae})
+    return report
+
+def export_report(report):
+    lines = ["model       size(KB)  latency(ms)    mae  mae_delta"]
+    for r in report:
+        size = "{:8.1f}".format(r["size_kb"]) if r["size_kb"] is not None else "       -"
+        lines.append("{:10s}  {}  {:11.2f}  {:5.2f}  {:+9.3f}".format(r["model"], size, r["latency_ms"], r["mae"], r["mae_delta"]))
+    return "\n".join(lines)
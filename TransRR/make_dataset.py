@@ -4,8 +4,10 @@ Created on 2023-01
 @author: ZQ
 """
 import csv
+import os
 import numpy as np
 import pandas as pd
+from dataset_cache import cache_paths
 
 RATIO_TRAIN = 0.64
 RATIO_VAL = 0.16
@@ -18,6 +20,65 @@ def read_csv(win_size, csv_path):
         rows = [(np.array(row[0:2 * win_size + 2])) for row in reader]
     return rows
 
+def _count_rows(csv_path, block_size=1 << 24):
+    n_rows = 0
+    last = b"\n"
+    with open(csv_path, "rb") as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            n_rows += block.count(b"\n")
+            last = block[-1:]
+    if last != b"\n":
+        n_rows += 1
+    return n_rows
+
+# Parse the csv chunk by chunk into one float32 matrix [x1 (win_size), x2 (win_size), rr]
+# plus a separate patient id column. With cache=True the matrix is written once to a .npy
+# file next to the csv (or in cache_dir) and later calls memory-map it read-only.
+def load_csv(win_size, csv_path, cache=True, cache_dir=None, chunk_size=2048):
+    data_path, id_path = cache_paths(csv_path, cache_dir)
+    if cache and os.path.exists(data_path) and os.path.exists(id_path) \
+            and os.path.getmtime(data_path) >= os.path.getmtime(csv_path):
+        patient_id = np.load(id_path)
+        data = np.load(data_path, mmap_mode="r")
+        if data.shape[1] == 2 * win_size + 1:
+            print("load cache " + data_path)
+            return patient_id, data
+
+    n_rows = _count_rows(csv_path)
+    n_cols = 2 * win_size + 1
+    if cache:
+        data = np.lib.format.open_memmap(data_path + ".tmp", mode="w+", dtype=np.float32, shape=(n_rows, n_cols))
+    else:
+        data = np.empty((n_rows, n_cols), dtype=np.float32)
+    ids = []
+    filled = 0
+    reader = pd.read_csv(csv_path, header=None, usecols=range(n_cols + 1), dtype={0: str},
+                         chunksize=chunk_size, engine="c")
+    for chunk in reader:
+        n = len(chunk)
+        ids.append(chunk.iloc[:, 0].to_numpy(dtype=str))
+        data[filled:filled + n] = chunk.iloc[:, 1:].to_numpy(dtype=np.float32)
+        filled += n
+    patient_id = np.concatenate(ids) if ids else np.empty(0, dtype=str)
+
+    if not cache:
+        return patient_id, data[:filled]
+    data.flush()
+    del data
+    if filled != n_rows:
+        # blank lines were skipped by the parser, shrink the cache to the rows actually read
+        full = np.load(data_path + ".tmp", mmap_mode="r")
+        np.save(data_path + ".tmp2", full[:filled])
+        del full
+        os.replace(data_path + ".tmp2.npy", data_path + ".tmp")
+    os.replace(data_path + ".tmp", data_path)
+    np.save(id_path, patient_id)
+    print("write cache " + data_path)
+    return patient_id, np.load(data_path, mmap_mode="r")
+
 # when fold_num==-1, training set = all data
 # when fold_num==-1, training set + val set = all data
 def fold_n(fold_index, raw_data, fold_num):
@@ -58,6 +119,32 @@ def fold_n(fold_index, raw_data, fold_num):
 
     return np.array(train_set).astype(np.float), np.array(val_set).astype(np.float), np.array(test_set).astype(np.float)
 
+# same subject-level split as fold_n, but on the patient id column returned by load_csv:
+# ids are factorized once and each split is an integer index array into the shared matrix
+def fold_n_index(fold_index, patient_id, fold_num):
+    codes, patient_list = pd.factorize(patient_id)
+    all_patient_num = len(patient_list)
+    split = np.zeros(all_patient_num, dtype=np.int8)  # 0 train, 1 val, 2 test
+    if fold_num == -1:
+        split[:] = 2
+    elif fold_num == -2:
+        val_patient_num = int(all_patient_num*0.2)
+        split[:val_patient_num] = 1
+    else:
+        fold_size = int(all_patient_num/fold_num)
+        val_patient_num = int((all_patient_num - fold_size)*0.2)
+        split[fold_index*fold_size:fold_index*fold_size+fold_size] = 2
+        train_val_patient = np.flatnonzero(split == 0)
+        split[train_val_patient[:val_patient_num]] = 1
+    row_split = split[codes]
+    train_index = np.flatnonzero(row_split == 0)
+    val_index = np.flatnonzero(row_split == 1)
+    test_index = np.flatnonzero(row_split == 2)
+    print("train_set="+str(len(train_index)))
+    print("val_set=" + str(len(val_index)))
+    print("test_set=" + str(len(test_index)))
+    return train_index, val_index, test_index
+
 # when input_train_np==[], test set = all data
 def make_dataset_from_fold_n(win_size, input_train_np, input_val_np, input_test_np):
     train = input_train_np
@@ -94,4 +181,40 @@ def down_sampling(x1_train, x2_train, y_train, x1_val, x2_val, y_val, x1_test, x
     id = np.arange(0, max_index, down_sampling_grade)
     return x1_train.take(id,1), x2_train.take(id,1), y_train, \
            x1_val.take(id,1), x2_val.take(id,1), y_val, \
-           x1_test.take(id,1), x2_test.take(id,1), y_test
\ No newline at end of file
+           x1_test.take(id,1), x2_test.take(id,1), y_test
+
+def fold_labels(data, index, win_size):
+    return np.asarray(data[index, win_size*2], dtype=np.float32)
+
+# Lazy tf.data pipeline over the shared matrix from load_csv: each batch gathers only the
+# decimated ECG/PPG columns and the label of its rows, so no full-rate copy of a fold exists.
+# Yields ((x1, x2), y) with x1/x2 of shape (batch, ceil(win_size/down_sampling_grade), 1).
+# With soft_targets (one value per row of data, e.g. teacher predictions) y is (batch, 2):
+# [label, soft target]. TensorFlow is imported here so load_csv/fold_n_index work without it.
+def make_tf_dataset(data, index, win_size, down_sampling_grade=8, batch_size=64, shuffle=False, seed=None,
+                    soft_targets=None):
+    import tensorflow as tf
+    x1_cols = np.arange(0, win_size, down_sampling_grade)
+    x2_cols = x1_cols + win_size
+    cols = np.concatenate([x1_cols, x2_cols, [win_size*2]])
+    n = len(x1_cols)
+
+    def gather(batch_index):
+        rows = np.asarray(data[batch_index[:, None], cols], dtype=np.float32)
+        y = rows[:, 2*n]
+        if soft_targets is not None:
+            y = np.stack([y, np.asarray(soft_targets[batch_index], dtype=np.float32)], axis=1)
+        return rows[:, :n, None], rows[:, n:2*n, None], y
+
+    def load(batch_index):
+        x1, x2, y = tf.numpy_function(gather, [batch_index], [tf.float32, tf.float32, tf.float32])
+        x1.set_shape([None, n, 1])
+        x2.set_shape([None, n, 1])
+        y.set_shape([None] if soft_targets is None else [None, 2])
+        return (x1, x2), y
+
+    ds = tf.data.Dataset.from_tensor_slices(np.asarray(index, dtype=np.int64))
+    if shuffle:
+        ds = ds.shuffle(len(index), seed=seed, reshuffle_each_iteration=True)
+    ds = ds.batch(batch_size).map(load, num_parallel_calls=tf.data.AUTOTUNE)
+    return ds.prefetch(tf.data.AUTOTUNE)
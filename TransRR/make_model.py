@@ -7,16 +7,19 @@ from keras.layers import *
 import tensorflow as tf
 import keras
 import numpy as np
+import functools
+
+@functools.lru_cache(maxsize=16)
+def _positional_table(maxlen, model_size):
+    i = np.arange(maxlen)[:, None]
+    j = np.arange(model_size)[None, :]
+    angle = i / 10000 ** ((j - j % 2) / model_size)
+    PE = np.where(j % 2 == 0, np.sin(angle), np.cos(angle)).astype(np.float32)
+    PE.flags.writeable = False
+    return PE
 
 def positional_embedding(maxlen, model_size):
-    PE = np.zeros((maxlen, model_size))
-    for i in range(maxlen):
-        for j in range(model_size):
-            if j % 2 == 0:
-                PE[i, j] = np.sin(i / 10000 ** (j / model_size))
-            else:
-                PE[i, j] = np.cos(i / 10000 ** ((j-1) / model_size))
-    PE = tf.constant(PE, dtype=tf.float32)
+    PE = tf.constant(_positional_table(maxlen, model_size), dtype=tf.float32)
     return PE
 
 def kernel_inception(x, filter):
@@ -35,17 +38,17 @@ def dilation_inception(x, filter):
     out = concatenate([pathway1, pathway2, pathway3, pathway4], axis=-1)
     return out
 
-def transformer_encoder(inputs, head_size=256, num_heads=8, dropout=0.2):
+def transformer_encoder(inputs, head_size=256, num_heads=8, dropout=0.2, filters=32):
     x = MultiHeadAttention(key_dim=head_size, num_heads=num_heads, dropout=dropout)(inputs, inputs)
     x = x + inputs
     res = LayerNormalization(axis=1, epsilon=1e-6)(x)
 
-    x = kernel_inception(res, filter=32)
+    x = kernel_inception(res, filter=filters)
     x = Dropout(dropout)(x)
-    x = Conv1D(filters=32, kernel_size=1)(x)
+    x = Conv1D(filters=filters, kernel_size=1)(x)
 
-    x = dilation_inception(x, filter=32)
-    x = Conv1D(filters=32, kernel_size=5, dilation_rate=16, activation="relu", padding="same")(x)
+    x = dilation_inception(x, filter=filters)
+    x = Conv1D(filters=filters, kernel_size=5, dilation_rate=16, activation="relu", padding="same")(x)
     x = Dropout(dropout)(x)
     x = Conv1D(filters=inputs.shape[-1], kernel_size=1)(x)
     x = x + res
@@ -53,26 +56,36 @@ def transformer_encoder(inputs, head_size=256, num_heads=8, dropout=0.2):
 
     return x
 
-def TransRR(win_size, num_transformer_blocks=4, mlp_dropout=0.2):
+# Named architectures for TransRR(win_size, **MODEL_CONFIGS[name]).
+# "baseline" is the original network, "readme" uses the head size 32 given in the README,
+# the others trade accuracy for speed on the Nano (compare them with model_profile.py).
+MODEL_CONFIGS = {
+    "baseline": dict(num_transformer_blocks=4, head_size=256, num_heads=8, filters=32, dense_units=(256, 64, 16)),
+    "readme": dict(num_transformer_blocks=4, head_size=32, num_heads=8, filters=32, dense_units=(256, 64, 16)),
+    "small": dict(num_transformer_blocks=2, head_size=32, num_heads=4, filters=16, dense_units=(128, 32, 16)),
+    "tiny": dict(num_transformer_blocks=1, head_size=16, num_heads=2, filters=8, dense_units=(64, 16)),
+}
+
+def TransRR(win_size, num_transformer_blocks=4, mlp_dropout=0.2, head_size=256, num_heads=8, filters=32,
+            dense_units=(256, 64, 16), dropout=0.2):
     # Input layer
-    input1 = Input(shape=(win_size, 1))
-    input2 = Input(shape=(win_size, 1))
+    input1 = Input(shape=(win_size, 1), name="ecg")
+    input2 = Input(shape=(win_size, 1), name="ppg")
     pos_embedding = positional_embedding(win_size, 1)
     pos_wise_input1 = input1 + pos_embedding
     pos_wise_input2 = input2 + pos_embedding
     input_layer = tf.concat([pos_wise_input1, pos_wise_input2], 2)
-    x = input_layer
+    # a layer casts its input to the policy's compute dtype (float16/bfloat16 under mixed
+    # precision), so the residual adds in the encoder see matching dtypes
+    x = Activation('linear')(input_layer)
 
     for _ in range(num_transformer_blocks):
-        x = transformer_encoder(x)
+        x = transformer_encoder(x, head_size=head_size, num_heads=num_heads, dropout=dropout, filters=filters)
 
     x = Flatten()(x)
-    x = Dense(256, activation="relu")(x)
-    x = Dropout(mlp_dropout)(x)
-    x = Dense(64, activation="relu")(x)
-    x = Dropout(mlp_dropout)(x)
-    x = Dense(16, activation="relu")(x)
-    x = Dropout(mlp_dropout)(x)
-    outputs = Dense(1)(x)
+    for units in dense_units:
+        x = Dense(units, activation="relu")(x)
+        x = Dropout(mlp_dropout)(x)
+    outputs = Dense(1, dtype="float32")(x)  # stays float32 under mixed precision policies
 
-    return keras.Model([input1, input2], outputs)
\ No newline at end of file
+    return keras.Model([input1, input2], outputs)
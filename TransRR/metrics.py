@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+METRICS = ("mae", "e", "pcc", "bias", "loa_low", "loa_high")
+
+# Stack ragged (rr_true, rr_pred) pairs from several folds/repeats/models into (runs, n)
+# arrays padded at the end, plus the mask of valid entries.
+def stack_runs(pairs):
+    n = max(len(t) for t, _ in pairs)
+    y_true = np.zeros((len(pairs), n))
+    y_pred = np.zeros((len(pairs), n))
+    mask = np.zeros((len(pairs), n), dtype=bool)
+    for i, (t, p) in enumerate(pairs):
+        y_true[i, :len(t)] = np.ravel(t)
+        y_pred[i, :len(p)] = np.ravel(p)
+        mask[i, :len(t)] = True
+    return y_true, y_pred, mask
+
+# All metrics along the last axis; w are per-sample weights (the mask, or bootstrap counts).
+# E is MAE / mean RR without rounding MAE first, LoA uses the population std like loss_loa.
+def _weighted_metrics(t, p, w):
+    n = w.sum(-1)
+    d = t - p
+    mean_t = (w * t).sum(-1) / n
+    mean_p = (w * p).sum(-1) / n
+    mae = (w * np.abs(d)).sum(-1) / n
+    bias = mean_t - mean_p
+    ct = t - mean_t[..., None]
+    cp = p - mean_p[..., None]
+    var_t = (w * ct * ct).sum(-1)
+    var_p = (w * cp * cp).sum(-1)
+    cov = (w * ct * cp).sum(-1)
+    sd = np.sqrt(np.maximum(var_t + var_p - 2 * cov, 0) / n)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        pcc = cov / np.sqrt(var_t * var_p)
+    return {"mae": mae, "e": mae / mean_t, "pcc": pcc, "bias": bias,
+            "loa_low": bias - 1.96 * sd, "loa_high": bias + 1.96 * sd}
+
+# MAE, E, PCC and LoA for every run at once. y_true/y_pred are (n,) or stacked (runs, n);
+# y_true may be shared by all runs. Returns a dict of float arrays with one value per run.
+def batch_metrics(y_true, y_pred, mask=None):
+    y_pred = np.asarray(y_pred, dtype=np.float64)
+    y_true = np.broadcast_to(np.asarray(y_true, dtype=np.float64), y_pred.shape)
+    w = np.ones(y_pred.shape) if mask is None else np.broadcast_to(mask, y_pred.shape).astype(np.float64)
+    return _weighted_metrics(y_true, y_pred, w)
+
+# Metrics from per-group sums (count, t, p, |t-p|, t*t, p*p, t*p) along the last axis.
+def _metrics_from_sums(sums):
+    n, st, sp, sabs, stt, spp, stp = np.moveaxis(sums, -1, 0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_t = st / n
+        mean_p = sp / n
+        var_t = stt / n - mean_t ** 2
+        var_p = spp / n - mean_p ** 2
+        cov = stp / n - mean_t * mean_p
+        mae = sabs / n
+        bias = mean_t - mean_p
+        sd = np.sqrt(np.maximum(var_t + var_p - 2 * cov, 0))
+        return {"n": n, "mae": mae, "e": mae / mean_t, "pcc": cov / np.sqrt(var_t * var_p), "bias": bias,
+                "loa_low": bias - 1.96 * sd, "loa_high": bias + 1.96 * sd}
+
+# Per-subject sums for _metrics_from_sums: (runs, n_subjects, 7) plus the sorted subject ids.
+def _subject_sums(y_true, y_pred, subject, mask=None):
+    subjects, inverse = np.unique(np.broadcast_to(subject, y_pred.shape), return_inverse=True)
+    inverse = inverse.reshape(y_pred.shape)
+    runs, s = y_pred.shape[0], len(subjects)
+    bins = (inverse + s * np.arange(runs)[:, None]).ravel()
+    w = (np.ones(y_pred.shape) if mask is None else np.broadcast_to(mask, y_pred.shape)).ravel().astype(np.float64)
+    t, p = y_true.ravel(), y_pred.ravel()
+    sums = np.stack([np.bincount(bins, weights=w * v, minlength=runs * s).reshape(runs, s)
+                     for v in (np.ones_like(t), t, p, np.abs(t - p), t * t, p * p, t * p)], axis=-1)
+    return subjects, sums
+
+# Cluster bootstrap: subjects are drawn with replacement (uniformly among the subjects each run
+# has) and bring all their windows. Every replicate is a vector of subject counts, so its metrics
+# come from counts @ per-subject sums without touching the windows again.
+def _subject_bootstrap(y_true, y_pred, subject, mask, n_boot, rng, chunk_size):
+    _, sums = _subject_sums(y_true, y_pred, subject, mask)
+    present = sums[..., 0] > 0  # (runs, n_subjects)
+    n_present = present.sum(-1)
+    pvals = present / np.maximum(n_present, 1)[:, None]
+    samples = {name: [] for name in METRICS}
+    for start in range(0, n_boot, chunk_size):
+        b = min(chunk_size, n_boot - start)
+        counts = rng.multinomial(n_present[:, None], pvals[:, None, :], size=(len(sums), b))
+        m = _metrics_from_sums(np.einsum("rbs,rsk->rbk", counts, sums))
+        for name in METRICS:
+            samples[name].append(m[name])
+    return samples
+
+# Percentile bootstrap confidence intervals of every metric and run. With subject ids the
+# bootstrap resamples whole subjects: overlapping windows of one subject are strongly correlated,
+# so resampling windows gives intervals that are far too narrow. Without subject ids individual
+# windows are resampled, drawing chunk_size bootstrap replicates of all runs at a time
+# (runs x chunk x n) so memory stays bounded. Returns {metric: (runs, 2)} lower/upper bounds
+# (squeezed for a single run).
+def bootstrap_ci(y_true, y_pred, mask=None, n_boot=1000, ci=0.95, seed=0, chunk_size=None, subject=None):
+    y_pred = np.atleast_2d(np.asarray(y_pred, dtype=np.float64))
+    y_true = np.broadcast_to(np.asarray(y_true, dtype=np.float64), y_pred.shape)
+    rng = np.random.default_rng(seed)
+    if subject is not None:
+        samples = _subject_bootstrap(y_true, y_pred, subject, mask, n_boot, rng, chunk_size or 1000)
+        return _percentile_bounds(samples, ci, len(y_pred))
+
+    mask = np.ones(y_pred.shape, dtype=bool) if mask is None else np.broadcast_to(mask, y_pred.shape)
+    # move the valid entries of every run to the front
+    order = np.argsort(~mask, axis=-1, kind="stable")
+    t = np.take_along_axis(y_true, order, -1)
+    p = np.take_along_axis(y_pred, order, -1)
+    runs, n = p.shape
+    lengths = mask.sum(-1)
+    if chunk_size is None:
+        chunk_size = max(1, min(n_boot, 10_000_000 // max(runs * n, 1)))
+
+    rows = np.arange(runs)[:, None, None]
+    valid = np.arange(n) < lengths[:, None, None]
+    samples = {name: [] for name in METRICS}
+    for start in range(0, n_boot, chunk_size):
+        b = min(chunk_size, n_boot - start)
+        idx = (rng.random((runs, b, n)) * lengths[:, None, None]).astype(np.int64)
+        m = _weighted_metrics(t[rows, idx], p[rows, idx], np.broadcast_to(valid, idx.shape).astype(np.float64))
+        for name in METRICS:
+            samples[name].append(m[name])
+    return _percentile_bounds(samples, ci, runs)
+
+def _percentile_bounds(samples, ci, runs):
+    q = 100 * np.array([(1 - ci) / 2, (1 + ci) / 2])
+    out = {}
+    for name in METRICS:
+        bounds = np.nanpercentile(np.concatenate(samples[name], axis=1), q, axis=1).T
+        out[name] = bounds[0] if runs == 1 else bounds
+    return out
+
+# Metrics per subject (and per run for stacked predictions) from bincount sums.
+# Returns the sorted subject ids and {metric: (n_subjects,) or (runs, n_subjects)}.
+def subject_metrics(y_true, y_pred, subject, mask=None):
+    y_pred = np.asarray(y_pred, dtype=np.float64)
+    single = y_pred.ndim == 1
+    y_pred = np.atleast_2d(y_pred)
+    y_true = np.broadcast_to(np.asarray(y_true, dtype=np.float64), y_pred.shape)
+    subjects, sums = _subject_sums(y_true, y_pred, subject, mask)
+    out = _metrics_from_sums(sums)
+    if single:
+        out = {name: v[0] for name, v in out.items()}
+    return subjects, out
+
+# Summary of a single run: point estimates with bootstrap CIs (resampling subjects when subject
+# ids are given, windows otherwise), then the per-subject table.
+# all_subjects (e.g. every id in the dataset) adds a coverage line listing the subjects
+# that have no predictions and are therefore not part of the metrics or the CIs.
+def metrics_report(y_true, y_pred, subject=None, n_boot=1000, seed=0, all_subjects=None):
+    point = batch_metrics(y_true, y_pred)
+    interval = bootstrap_ci(y_true, y_pred, n_boot=n_boot, seed=seed, subject=subject)
+    lines = ["{:8s} {:7.3f}  [{:7.3f}, {:7.3f}]".format(name, float(point[name]), *interval[name])
+             for name in METRICS]
+    if subject is not None and all_subjects is not None:
+        all_subjects = np.unique(all_subjects)
+        missing = np.setdiff1d(all_subjects, subject)
+        lines.append("coverage: {} of {} subjects{}".format(
+            len(all_subjects) - len(missing), len(all_subjects),
+            "" if len(missing) == 0 else ", not tested: " + " ".join(str(s) for s in missing)))
+    if subject is not None:
+        subjects, per_subject = subject_metrics(y_true, y_pred, subject)
+        lines.append("subject      n    mae      e    pcc")
+        for i, s in enumerate(subjects):
+            lines.append("{:7} {:6d} {:6.2f} {:6.3f} {:6.3f}".format(
+                s, int(per_subject["n"][i]), per_subject["mae"][i], per_subject["e"][i], per_subject["pcc"][i]))
+    return "\n".join(lines)
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+import sys
+import time
+import numpy as np
+import keras
+from keras.layers import Conv1D, Dense, MultiHeadAttention
+from make_model import TransRR, MODEL_CONFIGS
+
+# FLOPs of one forward pass for one window (1 multiply-add = 2 FLOPs), counted from the
+# convolution, dense and attention layers; element-wise ops and normalization are ignored.
+def model_flops(model):
+    flops = 0
+    for layer in model.layers:
+        if isinstance(layer, Conv1D):
+            k, c_in, c_out = layer.kernel.shape
+            flops += 2 * layer.output.shape[1] * k * c_in * c_out
+        elif isinstance(layer, Dense):
+            c_in, c_out = layer.kernel.shape
+            flops += 2 * c_in * c_out
+        elif isinstance(layer, MultiHeadAttention):
+            length = layer.output.shape[1]
+            d_q, heads, key_dim = layer._query_dense.kernel.shape
+            d_k = layer._key_dense.kernel.shape[0]
+            d_v, _, value_dim = layer._value_dense.kernel.shape
+            d_out = layer._output_dense.kernel.shape[-1]
+            projections = length * (d_q * heads * key_dim + d_k * heads * key_dim + d_v * heads * value_dim)
+            attention = heads * length * length * (key_dim + value_dim)
+            output = length * heads * value_dim * d_out
+            flops += 2 * (projections + attention + output)
+    return flops
+
+def model_latency(model, win_size, runs=50, batch_size=1):
+    rng = np.random.default_rng(0)
+    x1 = rng.normal(size=(batch_size, win_size, 1)).astype(np.float32)
+    x2 = rng.normal(size=(batch_size, win_size, 1)).astype(np.float32)
+    model([x1, x2], training=False)  # warm up
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        model([x1, x2], training=False)
+        latencies.append(time.perf_counter() - start)
+    return float(np.median(latencies)) / batch_size
+
+def profile_configs(win_size=250, configs=MODEL_CONFIGS, runs=50):
+    rows = []
+    for name, config in configs.items():
+        model = TransRR(win_size, **config)
+        rows.append({"config": name, "params": model.count_params(), "mflops": model_flops(model) / 1e6,
+                     "latency_ms": 1000 * model_latency(model, win_size, runs)})
+        keras.backend.clear_session()
+    return rows
+
+# configs not beaten on every key by another config (e.g. keys=("latency_ms", "mae") once
+# cross-validation MAE has been added to the rows)
+def pareto_front(rows, keys=("latency_ms", "params")):
+    front = []
+    for r in rows:
+        dominated = any(all(o[k] <= r[k] for k in keys) and any(o[k] < r[k] for k in keys)
+                        for o in rows if o is not r)
+        if not dominated:
+            front.append(r["config"])
+    return front
+
+def profile_report(rows, keys=("latency_ms", "params")):
+    front = pareto_front(rows, keys)
+    lines = ["config        params    MFLOPs  latency(ms)  pareto"]
+    for r in rows:
+        lines.append("{:10s} {:9d} {:9.1f} {:12.2f}  {}".format(
+            r["config"], r["params"], r["mflops"], r["latency_ms"], "*" if r["config"] in front else ""))
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    # python model_profile.py [config ...]
+    names = sys.argv[1:] or list(MODEL_CONFIGS)
+    print(profile_report(profile_configs(configs={name: MODEL_CONFIGS[name] for name in names})))
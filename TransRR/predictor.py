@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+import sys
+import time
+import numpy as np
+
+# Deployment-side predictor: needs only tflite_runtime (falls back to the TF Lite interpreter
+# bundled with TensorFlow), none of keras or the training modules.
+_import_start = time.perf_counter()
+try:
+    from tflite_runtime.interpreter import Interpreter
+except ImportError:
+    import tensorflow as tf
+    Interpreter = tf.lite.Interpreter
+IMPORT_TIME = time.perf_counter() - _import_start
+
+def quantize(x, detail):
+    if detail["dtype"] == np.float32:
+        return x.astype(np.float32)
+    scale, zero_point = detail["quantization"]
+    info = np.iinfo(detail["dtype"])
+    return np.clip(np.round(x / scale + zero_point), info.min, info.max).astype(detail["dtype"])
+
+def dequantize(y, detail):
+    if detail["dtype"] == np.float32:
+        return y
+    scale, zero_point = detail["quantization"]
+    return (y.astype(np.float32) - zero_point) * scale
+
+# ECG input first: matched on the input names "ecg"/"ppg" given in TransRR, else by name order
+def input_order(details):
+    details = sorted(details, key=lambda d: d["name"])
+    ecg = [d for d in details if "ecg" in d["name"]]
+    ppg = [d for d in details if "ppg" in d["name"]]
+    if len(ecg) == 1 and len(ppg) == 1:
+        return ecg + ppg
+    return details
+
+class TransRRPredictor:
+    """Run an exported TransRR .tflite model on batches of (ecg_window, ppg_window) pairs.
+
+    Tensors are allocated once for max_batch windows; smaller batches are zero-padded
+    instead of re-allocating. The instance is callable with the (batch, n, 1) arrays used
+    by model.predict, so it can be passed as predict_fn to the streaming engine.
+    """
+
+    def __init__(self, model_path, max_batch=1, num_threads=None, verbose=False):
+        start = time.perf_counter()
+        self.interpreter = Interpreter(model_path=model_path, num_threads=num_threads)
+        self.inputs = input_order(self.interpreter.get_input_details())
+        self.output = self.interpreter.get_output_details()[0]
+        self.win_size = int(self.inputs[0]["shape"][1])
+        self.verbose = verbose
+        self.batch = 0
+        self._allocate(max_batch)
+        self.last_latency = None
+        self.cold_start = IMPORT_TIME + time.perf_counter() - start
+        print("TransRRPredictor: cold start {:.1f} ms (import {:.1f} ms)".format(
+            1000 * self.cold_start, 1000 * IMPORT_TIME))
+
+    def _allocate(self, batch):
+        for detail in self.inputs:
+            self.interpreter.resize_tensor_input(detail["index"], [batch, self.win_size, 1])
+        self.interpreter.allocate_tensors()
+        self.buffers = [np.zeros((batch, self.win_size, 1), dtype=detail["dtype"]) for detail in self.inputs]
+        self.batch = batch
+
+    def predict(self, ecg, ppg):
+        ecg = np.asarray(ecg, dtype=np.float32).reshape(-1, self.win_size, 1)
+        ppg = np.asarray(ppg, dtype=np.float32).reshape(-1, self.win_size, 1)
+        n = len(ecg)
+        if n > self.batch:
+            self._allocate(n)
+        start = time.perf_counter()
+        for x, buffer, detail in zip((ecg, ppg), self.buffers, self.inputs):
+            buffer[:n] = quantize(x, detail)
+            buffer[n:] = 0
+            self.interpreter.set_tensor(detail["index"], buffer)
+        self.interpreter.invoke()
+        rr = dequantize(self.interpreter.get_tensor(self.output["index"]), self.output).reshape(-1)[:n]
+        self.last_latency = (time.perf_counter() - start) / n
+        if self.verbose:
+            print("TransRRPredictor: {} windows, {:.2f} ms/window".format(n, 1000 * self.last_latency))
+        return rr
+
+    def __call__(self, x1, x2):
+        return self.predict(x1, x2)[:, None]
+
+if __name__ == "__main__":
+    # python predictor.py transrr_dynamic.tflite [batch]
+    batch = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    predictor = TransRRPredictor(sys.argv[1], max_batch=batch, verbose=True)
+    rng = np.random.default_rng(0)
+    for _ in range(5):
+        predictor.predict(rng.normal(size=(batch, predictor.win_size)), rng.normal(size=(batch, predictor.win_size)))
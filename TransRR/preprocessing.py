@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import butter, sosfilt, sosfilt_zi
+
+FS = 125
+LOW_CUT = 0.1
+HIGH_CUT = 0.6
+FILTER_ORDER = 3
+
+# Resample an irregularly timestamped stream onto the grid t0 + k/fs. Each call returns the
+# absolute grid index of the first new sample and the values of all grid points that are
+# now covered by data; the last input sample is kept to interpolate across chunk borders.
+class StreamResampler:
+    def __init__(self, fs=FS, t0=0.0):
+        self.fs = fs
+        self.t0 = t0
+        self.next_index = None
+        self.last_t = None
+        self.last_v = None
+
+    def process(self, t, x):
+        t = np.asarray(t, dtype=float)
+        x = np.asarray(x, dtype=float)
+        if len(t) == 0:
+            return self.next_index or 0, np.empty(0)
+        if self.last_t is not None:
+            t = np.concatenate([[self.last_t], t])
+            x = np.concatenate([[self.last_v], x])
+        if self.next_index is None:
+            self.next_index = max(0, int(np.ceil((t[0] - self.t0) * self.fs)))
+        stop = int(np.floor((t[-1] - self.t0) * self.fs)) + 1
+        start = self.next_index
+        grid = self.t0 + np.arange(start, max(start, stop)) / self.fs
+        self.next_index = max(start, stop)
+        self.last_t = t[-1]
+        self.last_v = x[-1]
+        return start, np.interp(grid, t, x)
+
+# Causal Butterworth band-pass that carries the filter state (zi) between chunks, so a
+# stream filtered chunk by chunk gives the same output as filtering it in one piece.
+class StreamingBandpass:
+    def __init__(self, fs=FS, low=LOW_CUT, high=HIGH_CUT, order=FILTER_ORDER):
+        self.sos = butter(order, [low, high], btype='bandpass', fs=fs, output='sos')
+        self.zi = None
+
+    def process(self, x):
+        x = np.asarray(x, dtype=float)
+        if len(x) == 0:
+            return x
+        if self.zi is None:
+            self.zi = sosfilt_zi(self.sos) * x[0]
+        y, self.zi = sosfilt(self.sos, x, zi=self.zi)
+        return y
+
+    def reset(self):
+        self.zi = None
+
+# z-score with running mean/variance (Chan et al. parallel update), i.e. the statistics of
+# everything seen so far. process() normalises each chunk with the statistics up to and
+# including that chunk, so the output depends on how the stream was chunked: one call over
+# a whole record gives the subject-level z-score, while the live engine's early samples are
+# normalised with the statistics of the first few seconds only.
+class RunningZScore:
+    def __init__(self, eps=1e-8):
+        self.eps = eps
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, x):
+        x = np.asarray(x, dtype=float)
+        n = len(x)
+        if n == 0:
+            return
+        mean = np.mean(x)
+        m2 = np.sum((x - mean) ** 2)
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta ** 2 * self.count * n / total
+        self.count = total
+
+    @property
+    def std(self):
+        return np.sqrt(self.m2 / self.count) if self.count else 0.0
+
+    def transform(self, x):
+        return (np.asarray(x, dtype=float) - self.mean) / (self.std + self.eps)
+
+    def process(self, x):
+        self.update(x)
+        return self.transform(x)
+
+# Overlapping windows over a stream. Samples are written twice into a buffer of 2*win_size,
+# so the latest win_size samples are always one contiguous slice and windows are returned
+# as views without copying. A window is emitted whenever the absolute sample index of its
+# end is a multiple of hop_size; the view is only valid until the next sample is pushed.
+class SlidingWindower:
+    def __init__(self, win_size, hop_size, start_index=0, dtype=np.float32):
+        self.win_size = win_size
+        self.hop_size = hop_size
+        self.buffer = np.zeros(2 * win_size, dtype=dtype)
+        self.index = start_index
+        self.filled = 0
+
+    def push(self, x):
+        x = np.asarray(x)
+        done = 0
+        while done < len(x):
+            # write up to the next window boundary, then emit
+            step = min(len(x) - done, self.hop_size - self.index % self.hop_size)
+            pos = (self.index + np.arange(step)) % self.win_size
+            self.buffer[pos] = x[done:done + step]
+            self.buffer[pos + self.win_size] = x[done:done + step]
+            self.index += step
+            self.filled = min(self.win_size, self.filled + step)
+            done += step
+            if self.index % self.hop_size == 0 and self.filled == self.win_size:
+                start = self.index % self.win_size
+                yield self.index, self.buffer[start:start + self.win_size]
+
+# Offline version of the same chain for a whole record already at fs:
+# band-pass -> z-score -> (n_windows, win_size) strided view.
+# The band-pass output does not depend on chunking. With chunk_size=None the z-score uses
+# the statistics of the whole record (subject-level). To reproduce a stream that arrived
+# in chunks of chunk_size samples, pass chunk_size and the running z-score is fed the same way.
+def preprocess_record(x, fs=FS, low=LOW_CUT, high=HIGH_CUT, order=FILTER_ORDER, chunk_size=None):
+    y = StreamingBandpass(fs, low, high, order).process(x)
+    if chunk_size is None:
+        return RunningZScore().process(y)
+    zscore = RunningZScore()
+    return np.concatenate([zscore.process(y[i:i + chunk_size]) for i in range(0, len(y), chunk_size)])
+
+def sliding_windows(x, win_size, hop_size):
+    return sliding_window_view(x, win_size, axis=-1)[..., ::hop_size, :]
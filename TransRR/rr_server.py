@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+import sys
+import json
+import time
+import threading
+import argparse
+import collections
+import urllib.request
+import urllib.error
+import numpy as np
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Local RR inference service shared by many bedside devices (sessions).
+#   POST /predict  {"session": "bed3", "ecg": [...], "ppg": [...]}  ->  {"session", "rr", "latency_ms", "batch_size"}
+#                  ecg/ppg are one preprocessed, downsampled window each (win_size samples)
+#   GET  /metrics  request/reject counts, batch sizes and p50/p99 latency, overall and per session
+# Requests arriving within max_wait of each other are stacked into one forward pass. Each session
+# may have at most queue_size windows waiting; further windows get HTTP 429 so a device that falls
+# behind (or floods the server) cannot delay the others.
+
+class Backpressure(Exception):
+    pass
+
+class _Request:
+    __slots__ = ("session", "ecg", "ppg", "arrival", "done", "rr", "batch_size", "error")
+
+    def __init__(self, session, ecg, ppg):
+        self.session = session
+        self.ecg = ecg
+        self.ppg = ppg
+        self.arrival = time.perf_counter()
+        self.done = threading.Event()
+        self.rr = None
+        self.batch_size = 0
+        self.error = None
+
+class LatencyStats:
+    """Counters and a window of the most recent latencies (s) for percentile estimates."""
+
+    def __init__(self, window=2048):
+        self.latencies = collections.deque(maxlen=window)
+        self.requests = 0
+        self.rejected = 0
+
+    def summary(self):
+        lat = np.array(self.latencies)
+        p50, p99 = (1000 * np.percentile(lat, [50, 99])) if len(lat) else (None, None)
+        return {"requests": self.requests, "rejected": self.rejected, "p50_ms": p50, "p99_ms": p99}
+
+class MicroBatcher:
+    """Collects windows from all sessions and runs them through predict_fn in batches.
+
+    predict_fn takes (batch, win_size, 1) ECG and PPG arrays and returns (batch, 1) RR, like
+    model.predict or TransRRPredictor. The worker waits at most max_wait after the first pending
+    window for more to arrive, then takes up to max_batch windows round-robin over the sessions.
+    """
+
+    def __init__(self, predict_fn, win_size, max_batch=32, max_wait=0.005, queue_size=4):
+        self.predict_fn = predict_fn
+        self.win_size = win_size
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.queue_size = queue_size
+        self.queues = collections.OrderedDict()
+        self.pending = 0
+        self.cond = threading.Condition()
+        self.stats = LatencyStats()
+        self.session_stats = collections.defaultdict(LatencyStats)
+        self.batch_sizes = collections.deque(maxlen=2048)
+        self.is_running = False
+        self.thread = None
+
+    def start(self):
+        self.is_running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.cond:
+            self.is_running = False
+            self.cond.notify_all()
+        if self.thread is not None:
+            self.thread.join()
+
+    def submit(self, session, ecg, ppg, timeout=5.0):
+        ecg = np.asarray(ecg, dtype=np.float32).reshape(self.win_size, 1)
+        ppg = np.asarray(ppg, dtype=np.float32).reshape(self.win_size, 1)
+        request = _Request(session, ecg, ppg)
+        with self.cond:
+            queue = self.queues.setdefault(session, collections.deque())
+            stats = self.session_stats[session]
+            if len(queue) >= self.queue_size:
+                stats.rejected += 1
+                self.stats.rejected += 1
+                raise Backpressure("session {} has {} windows waiting".format(session, len(queue)))
+            queue.append(request)
+            self.pending += 1
+            self.cond.notify()
+        if not request.done.wait(timeout):
+            raise TimeoutError("no result within {} s".format(timeout))
+        if request.error is not None:
+            raise request.error
+        return request
+
+    def _take_batch(self):
+        batch = []
+        while len(batch) < self.max_batch and self.pending > 0:
+            for session in list(self.queues):
+                queue = self.queues[session]
+                if queue:
+                    batch.append(queue.popleft())
+                    self.pending -= 1
+                    if len(batch) == self.max_batch:
+                        break
+                if not queue:
+                    del self.queues[session]
+        # rotate so the next batch starts with a different session
+        if self.queues:
+            self.queues.move_to_end(next(iter(self.queues)))
+        return batch
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while self.is_running and self.pending == 0:
+                    self.cond.wait()
+                if not self.is_running:
+                    return
+                deadline = time.perf_counter() + self.max_wait
+                while self.pending < self.max_batch:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0 or not self.cond.wait(remaining):
+                        break
+                batch = self._take_batch()
+
+            try:
+                x1 = np.stack([r.ecg for r in batch])
+                x2 = np.stack([r.ppg for r in batch])
+                rr = np.asarray(self.predict_fn(x1, x2), dtype=np.float64).reshape(-1)
+                if len(rr) != len(batch):
+                    # fail the whole batch now instead of leaving the unmatched requests to time out
+                    raise RuntimeError("predict_fn returned {} values for a batch of {}".format(len(rr), len(batch)))
+            except Exception as e:
+                for r in batch:
+                    r.error = e
+                    r.done.set()
+                continue
+            now = time.perf_counter()
+            with self.cond:
+                self.batch_sizes.append(len(batch))
+                for r in batch:
+                    for stats in (self.stats, self.session_stats[r.session]):
+                        stats.requests += 1
+                        stats.latencies.append(now - r.arrival)
+            for r, value in zip(batch, rr):
+                r.rr = float(value)
+                r.batch_size = len(batch)
+                r.done.set()
+
+    def metrics(self):
+        with self.cond:
+            batch_sizes = np.array(self.batch_sizes)
+            out = self.stats.summary()
+            out.update({"pending": self.pending,
+                        "mean_batch_size": float(batch_sizes.mean()) if len(batch_sizes) else None,
+                        "sessions": {s: stats.summary() for s, stats in self.session_stats.items()}})
+        return out
+
+class RRRequestHandler(BaseHTTPRequestHandler):
+    batcher = None
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            self._reply(200, self.batcher.metrics())
+        else:
+            self._reply(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/predict":
+            self._reply(404, {"error": "not found"})
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            session = str(body["session"])
+            ecg, ppg = body["ecg"], body["ppg"]
+        except (ValueError, KeyError, TypeError) as e:
+            self._reply(400, {"error": "bad request: {}".format(e)})
+            return
+        try:
+            request = self.batcher.submit(session, ecg, ppg)
+        except Backpressure as e:
+            self._reply(429, {"error": str(e)})
+        except ValueError as e:
+            self._reply(400, {"error": "window must have {} samples: {}".format(self.batcher.win_size, e)})
+        except TimeoutError as e:
+            self._reply(503, {"error": str(e)})
+        except Exception as e:
+            self._reply(500, {"error": repr(e)})
+        else:
+            self._reply(200, {"session": session, "rr": request.rr, "batch_size": request.batch_size,
+                              "latency_ms": 1000 * (time.perf_counter() - request.arrival)})
+
+    def log_message(self, format, *args):
+        pass
+
+def load_predict_fn(model_path, max_batch=32):
+    if model_path.endswith(".tflite"):
+        from predictor import TransRRPredictor
+        predictor = TransRRPredictor(model_path, max_batch=max_batch)
+        return predictor, predictor.win_size
+    import keras
+    model = keras.models.load_model(model_path, compile=False)
+    return (lambda x1, x2: np.asarray(model([x1, x2], training=False))), int(model.inputs[0].shape[1])
+
+def serve(model_path, host="127.0.0.1", port=8500, max_batch=32, max_wait=0.005, queue_size=4):
+    predict_fn, win_size = load_predict_fn(model_path, max_batch)
+    batcher = MicroBatcher(predict_fn, win_size, max_batch, max_wait, queue_size)
+    handler = type("Handler", (RRRequestHandler,), {"batcher": batcher})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    batcher.start()
+    print("RR server on http://{}:{} (win_size {}, max_batch {}, max_wait {} ms)".format(
+        host, port, win_size, max_batch, 1000 * max_wait))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        batcher.stop()
+
+class RemotePredictor:
+    """predict_fn that sends windows to an rr_server, e.g. for RRInferenceEngine(predict_fn=...).
+
+    Windows rejected with 429 (server busy with this session) return NaN instead of raising.
+    Transport errors (server down, refused connection, timeout, other HTTP errors or a bad
+    reply) are printed and also return NaN, so the caller skips the window and keeps running.
+    """
+
+    def __init__(self, url, session, timeout=5.0):
+        self.url = url.rstrip("/") + "/predict"
+        self.session = session
+        self.timeout = timeout
+
+    def predict_one(self, ecg, ppg):
+        data = json.dumps({"session": self.session, "ecg": np.ravel(ecg).tolist(),
+                           "ppg": np.ravel(ppg).tolist()}).encode()
+        request = urllib.request.Request(self.url, data, {"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())["rr"]
+        except urllib.error.HTTPError as e:
+            if e.code != 429:
+                print("rr_server {}: HTTP {} {}".format(self.url, e.code, e.reason))
+        except (OSError, ValueError, KeyError) as e:  # URLError, refused connection, socket.timeout, bad json
+            print("rr_server {}: {!r}".format(self.url, e))
+        return float("nan")
+
+    def __call__(self, x1, x2):
+        return np.array([[self.predict_one(e, p)] for e, p in zip(x1, x2)], dtype=np.float32)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="TransRR micro-batching inference server")
+    parser.add_argument("model", help=".tflite or .keras model")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8500)
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--queue-size", type=int, default=4)
+    args = parser.parse_args(sys.argv[1:])
+    serve(args.model, args.host, args.port, args.max_batch, args.max_wait_ms / 1000, args.queue_size)
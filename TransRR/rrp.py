@@ -6,21 +6,22 @@ Created on 2023-01
 
 import os
 os.environ["CUDA_VISIBLE_DEVICES"] = "0"  # 设置使用的GPU设备（例如这里选择GPU 0）
-import time
 import random
-from keras import optimizers
-from keras.callbacks import ReduceLROnPlateau, EarlyStopping
+from keras.callbacks import ReduceLROnPlateau, EarlyStopping, CSVLogger
 from make_dataset import *  # 导入自定义的数据集处理模块
 from make_model import *  # 导入自定义的模型创建模块
 from Utils import *  # 导入辅助函数模块
+from scheduler import run_parallel  # 多进程并行训练各折
+from export import export_model, export_report, representative_dataset, QUANTIZATIONS  # 模型导出与量化
+from distill import distill, distill_report  # 知识蒸馏
+from metrics import batch_metrics, metrics_report  # 向量化评价指标与bootstrap置信区间
+from train_utils import *  # 混合精度、训练计时与断点续训
 import tensorflow as tf
 
-# 打印开始信息
-print("[  Respiratory Rate Prediction Starts  ]")
-
 # 配置参数
-LOAD_FORM_SAVE = False  # 是否从保存文件加载模型
-LOAD_MODEL = False  # 是否加载已有模型
+LOAD_FORM_SAVE = False  # 断点续训：跳过RUN_DIR中已完成的折，未完成的从最近一轮的检查点继续
+LOAD_MODEL = False  # 不训练，直接加载RUN_DIR中已训练好的权重进行评估
+RUN_DIR = './runs'  # 每折/每次重复的权重、优化器状态、训练历史、预测结果和随机种子
 WIN_SIZE = 125*16  # 窗口大小
 BATCH_SIZE = 64  # 批大小
 EPOCHS = 500  # 训练轮数
@@ -34,173 +35,154 @@ DENSE1_DIM = 512  # 第一层全连接层的维度
 DENSE2_DIM = 128  # 第二层全连接层的维度
 MAX = 1000000000  # 随机种子的最大值
 FOLD_NUM = 10  # 交叉验证的折数
-
-# 训练过程中使用的回调函数
-reduce_lr = ReduceLROnPlateau(monitor='val_loss', factor=0.9, patience=5, mode='auto', min_lr=0.0001)
-early_stop = EarlyStopping(monitor="val_loss", patience=20, verbose=0, mode="min")  # 早停策略
+REPEAT_NUM = 1  # 每折重复训练次数
+PARALLEL_WORKERS = 1  # 并行训练的进程数（1为顺序训练）
+THREADS_PER_WORKER = None  # 每个进程的线程数（None为CPU核数/进程数）
+MODEL_CONFIG = "baseline"  # 模型结构（见make_model.MODEL_CONFIGS，用model_profile.py比较参数量/FLOPs/延迟）
+DISTILL = False  # 训练完成后用该折的教师模型蒸馏一个小模型
+STUDENT_CONFIG = "small"  # 学生模型结构
+DISTILL_ALPHA = 0.5  # 损失中真实标签的权重（其余为教师预测）
+PRECISION = "float32"  # 训练精度："float32", "mixed_float16"（GPU）或 "mixed_bfloat16"（GPU/支持bf16的CPU）
+JIT_COMPILE = False  # 使用XLA编译训练步
+EXPORT_MODEL = False  # 每折训练后导出SavedModel和TFLite模型
+EXPORT_DIR = './export'  # 导出目录
+EXPORT_QUANTIZATIONS = QUANTIZATIONS  # TFLite量化方式：float32, dynamic, fp16, int8
 
 # 数据集路径（CSV文件）
 csv_path = '/home/zz/respiratory_rate_prediction/data/bidmc_RR_16s_overlap87.5_vmd_zscore_RRscreen.csv'
 # csv_path = '/home/zz/respiratory_rate_prediction/data/capnobase_RR_16s_overlap87.5_vmd_zscore_RRscreen_age5.csv'
 
-# 读取数据
-raw_data = read_csv(WIN_SIZE, csv_path)
-
-# 进行K折交叉验证
-for fold_index in range(FOLD_NUM):
-    # 切分数据为训练、验证、测试集
-    input_train_np, input_val_np, input_test_np = fold_n(fold_index=fold_index, raw_data=raw_data, fold_num=FOLD_NUM)
-
-    # 构建数据集
-    x1_train, x2_train, y_train, x1_val, x2_val, y_val, x1_test, x2_test, y_test = make_dataset_from_fold_n(
-        win_size=WIN_SIZE, input_train_np=input_train_np, input_val_np=input_val_np, input_test_np=input_test_np)
-
-    # 对数据进行下采样
-    x1_train, x2_train, y_train, x1_val, x2_val, y_val, x1_test, x2_test, y_test = down_sampling(
-        x1_train, x2_train, y_train, x1_val, x2_val, y_val, x1_test, x2_test, y_test, down_sampling_grade=DOWN_SAMPLING_GRADE)
-
-    # 进行多次重复训练
-    for repeat_index in range(1):
-        TIME_STAMP = time.strftime('%Y-%m-%d-%H-%M', time.localtime(time.time()))  # 获取当前时间戳
 
-        # 设置随机种子，确保结果可复现
-        seed_value = np.random.randint(MAX)
-        random.seed(seed_value)
-        np.random.seed(seed_value)
-        tf.random.set_seed(seed_value)
-        print("The seed value in {}th training is {}".format(repeat_index, seed_value))
-
-        # 创建模型
-        model = TransRR(250)  # 这里假设TransRR是你自己定义的模型
-        model.compile(optimizer=optimizers.Adam(lr=LR), loss="mae")  # 使用Adam优化器和MAE损失函数
+def train_fold(fold_index, repeat_index, seed_value):
+    # 读取数据（float32矩阵 + 受试者编号，使用内存映射的.npy缓存，多进程之间只读共享）
+    patient_id, raw_data = load_csv(WIN_SIZE, csv_path)
+
+    # 按受试者切分训练、验证、测试集（行索引）
+    train_index, val_index, test_index = fold_n_index(fold_index=fold_index, patient_id=patient_id, fold_num=FOLD_NUM)
+
+    # 实际值
+    y_test = fold_labels(raw_data, test_index, WIN_SIZE)
+
+    # 运行目录（续训时沿用保存的随机种子，已完成的直接读取结果）
+    run_dir = os.path.join(RUN_DIR, "fold{}_repeat{}".format(fold_index, repeat_index))
+    if LOAD_FORM_SAVE and run_finished(run_dir):
+        print("[ fold_index-{}(repeat{}) already finished, loaded from {} ]".format(fold_index, repeat_index, run_dir))
+        return load_run(run_dir)
+    seed_value = start_run(run_dir, fold_index, repeat_index, seed_value, resume=LOAD_FORM_SAVE or LOAD_MODEL)
+
+    # 设置随机种子，确保结果可复现
+    random.seed(seed_value)
+    np.random.seed(seed_value)
+    tf.random.set_seed(seed_value)
+    print("The seed value in {}th training is {}".format(repeat_index, seed_value))
+
+    # 构建数据集（按批读取行、拆分ECG/PPG并下采样，不生成全采样率副本）
+    train_ds = make_tf_dataset(raw_data, train_index, WIN_SIZE, DOWN_SAMPLING_GRADE, BATCH_SIZE, shuffle=True)
+    val_ds = make_tf_dataset(raw_data, val_index, WIN_SIZE, DOWN_SAMPLING_GRADE, BATCH_SIZE)
+    test_ds = make_tf_dataset(raw_data, test_index, WIN_SIZE, DOWN_SAMPLING_GRADE, BATCH_SIZE)
+
+    # 训练过程中使用的回调函数
+    reduce_lr = ReduceLROnPlateau(monitor='val_loss', factor=0.9, patience=5, mode='auto', min_lr=0.0001)
+    early_stop = EarlyStopping(monitor="val_loss", patience=20, verbose=0, mode="min")  # 早停策略
+    epoch_timer = EpochTimer(len(train_index))  # 每轮耗时与吞吐量（samples/s）
+
+    # 创建模型（混合精度下最后的Dense(1)仍为float32，float16时优化器带损失缩放）
+    precision = set_precision(PRECISION)
+    model = TransRR(250, **MODEL_CONFIGS[MODEL_CONFIG])
+    model.compile(optimizer=make_optimizer(LR, precision), loss="mae", jit_compile=JIT_COMPILE)  # 使用Adam优化器和MAE损失函数
+    if PARALLEL_WORKERS == 1:
         model.summary()  # 打印模型概述
 
-        # 训练模型
-        history = model.fit(x=[x1_train, x2_train], y=[y_train],
-                            validation_data=([x1_val, x2_val], [y_val]),
-                            batch_size=64, shuffle=True, epochs=EPOCHS, verbose=1,
-                            callbacks=[reduce_lr, early_stop])  # 训练并使用回调函数
-
-        # 训练历史记录
-        loss = history.history['loss']
-        val_loss = history.history['val_loss']
-
-        # 预测结果
-        predicted_rr_train = model.predict(x=[x1_train, x2_train], verbose=1)
-        predicted_rr_val = model.predict(x=[x1_val, x2_val], verbose=1)
-        predicted_rr_test = model.predict(x=[x1_test, x2_test], verbose=1)
-
-        # 实际值
-        real_rr_train = y_train
-        real_rr_val = y_val
-        real_rr_test = y_test
-
-        # 去掉多余的维度
-        predicted_rr_train = predicted_rr_train.squeeze()
-        real_rr_train = real_rr_train.squeeze()
-        predicted_rr_val = predicted_rr_val.squeeze()
-        real_rr_val = real_rr_val.squeeze()
-        predicted_rr_test = predicted_rr_test.squeeze()
-        real_rr_test = real_rr_test.squeeze()
-
-        # 计算评估指标
-        rr_in_train = np.array(real_rr_train)
-        rr_in_val = np.array(real_rr_val)
-        rr_in_test = np.array(real_rr_test)
-
-        # 打印当前折次和重复训练的结果
-        print("[ fold_index-"+str(fold_index)+"(repeat" +str(repeat_index)+") Respiratory Rate Prediction Ends ]")
-        print("val_loss:" + str(round(val_loss[-1],2)))  # 打印验证集的最终损失
-        print("test mae:", loss_mae(rr_in_test, predicted_rr_test))  # 打印测试集MAE
-        print("test e:", loss_e(rr_in_test, predicted_rr_test))  # 打印测试集的E指标（可能是误差）
-        print("test pcc:", loss_pcc(rr_in_test, predicted_rr_test))  # 打印测试集的PCC（皮尔逊相关系数）
-        print("test loa:", loss_loa(rr_in_test, predicted_rr_test))  # 打印测试集LOA（差异分析）
-
-# 打印所有训练完成的信息
-print("[ ALL Respiratory Rate Prediction Ends ]")
-
-exit(0)  # 程序结束
-
-from Utils import *
-import tensorflow as tf
-
-print("[  Respiratory Rate Prediction Starts  ]")
-LOAD_FORM_SAVE = False
-LOAD_MODEL = False
-WIN_SIZE = 125*16
-BATCH_SIZE = 64
-EPOCHS = 500
-DOWN_SAMPLING_GRADE = 8
-LR = 0.001
-CNN_FILTERS = 512
-CNN_KERNEL = 20
-LSTM_UNIT = 256
-LSTM_DENSE = 1024
-DENSE1_DIM = 512
-DENSE2_DIM = 128
-MAX = 1000000000
-FOLD_NUM = 10
-reduce_lr = ReduceLROnPlateau(monitor='val_loss', factor=0.9, patience=5, mode='auto', min_lr=0.0001)
-early_stop = EarlyStopping(monitor="val_loss", patience=20, verbose=0, mode="min")
-
-# dataset
-csv_path = '/home/zz/respiratory_rate_prediction/data/bidmc_RR_16s_overlap87.5_vmd_zscore_RRscreen.csv'
-# csv_path = '/home/zz/respiratory_rate_prediction/data/capnobase_RR_16s_overlap87.5_vmd_zscore_RRscreen_age5.csv'
-
-raw_data = read_csv(WIN_SIZE, csv_path)
-
-for fold_index in range(FOLD_NUM):
-    input_train_np, input_val_np, input_test_np = fold_n(fold_index=fold_index, raw_data=raw_data, fold_num=FOLD_NUM)
-
-    x1_train, x2_train, y_train, x1_val, x2_val, y_val, x1_test, x2_test, y_test = make_dataset_from_fold_n(
-        win_size=WIN_SIZE, input_train_np=input_train_np, input_val_np=input_val_np, input_test_np=input_test_np)
-
-    x1_train, x2_train, y_train, x1_val, x2_val, y_val, x1_test, x2_test, y_test = down_sampling(
-        x1_train, x2_train, y_train, x1_val, x2_val, y_val, x1_test, x2_test, y_test, down_sampling_grade=DOWN_SAMPLING_GRADE)
-
-    for repeat_index in range(1):
-        TIME_STAMP = time.strftime('%Y-%m-%d-%H-%M', time.localtime(time.time()))
-
-        seed_value = np.random.randint(MAX)
-        random.seed(seed_value)
-        np.random.seed(seed_value)
-        tf.random.set_seed(seed_value)
-        print("The seed value in {}th training is {}".format(repeat_index, seed_value))
-
-        model = TransRR(250)
-        model.compile(optimizer=optimizers.Adam(lr=LR), loss="mae")
-        model.summary()
-
-        history = model.fit(x=[x1_train, x2_train], y=[y_train],
-                            validation_data=([x1_val, x2_val], [y_val]),
-                            batch_size=64, shuffle=True, epochs=EPOCHS, verbose=1,
-                            callbacks=[reduce_lr, early_stop])
-
-        loss = history.history['loss']
-        val_loss = history.history['val_loss']
-        predicted_rr_train = model.predict(x=[x1_train, x2_train], verbose=1)
-        predicted_rr_val = model.predict(x=[x1_val, x2_val], verbose=1)
-        predicted_rr_test = model.predict(x=[x1_test, x2_test], verbose=1)
-        real_rr_train = y_train
-        real_rr_val = y_val
-        real_rr_test = y_test
-
-        predicted_rr_train = predicted_rr_train.squeeze()
-        real_rr_train = real_rr_train.squeeze()
-        predicted_rr_val = predicted_rr_val.squeeze()
-        real_rr_val = real_rr_val.squeeze()
-        predicted_rr_test = predicted_rr_test.squeeze()
-        real_rr_test = real_rr_test.squeeze()
-
-        rr_in_train = np.array(real_rr_train)
-        rr_in_val = np.array(real_rr_val)
-        rr_in_test = np.array(real_rr_test)
-        print("[ fold_index-"+str(fold_index)+"(repeat" +str(repeat_index)+") Respiratory Rate Prediction Ends ]")
-        print("val_loss:" + str(round(val_loss[-1],2)))
-        print("test mae:", loss_mae(rr_in_test, predicted_rr_test))
-        print("test e:", loss_e(rr_in_test, predicted_rr_test))
-        print("test pcc:", loss_pcc(rr_in_test, predicted_rr_test))
-        print("test loa:", loss_loa(rr_in_test, predicted_rr_test))
-
-print("[ ALL Respiratory Rate Prediction Ends ]")
-exit(0)
+    # 训练模型（每轮保存检查点和训练历史，续训时从最近的检查点继续）
+    verbose = 1 if PARALLEL_WORKERS == 1 else 2
+    weights_path = os.path.join(run_dir, "model.weights.h5")
+    history_path = os.path.join(run_dir, "history.csv")
+    if LOAD_MODEL or (LOAD_FORM_SAVE and os.path.exists(weights_path)):
+        model.load_weights(weights_path)  # 已训练完成，直接加载权重
+    else:
+        initial_epoch = restore_checkpoint(model, os.path.join(run_dir, "ckpt")) if LOAD_FORM_SAVE else 0
+        truncate_history(history_path, initial_epoch)
+        csv_logger = CSVLogger(history_path, append=initial_epoch > 0)
+        checkpoint = EpochCheckpoint(os.path.join(run_dir, "ckpt"))
+        model.fit(train_ds, validation_data=val_ds, epochs=EPOCHS, initial_epoch=initial_epoch, verbose=verbose,
+                  callbacks=[reduce_lr, early_stop, epoch_timer, csv_logger, checkpoint])  # 训练并使用回调函数
+        model.save_weights(weights_path)
+
+    # 训练历史记录（包括续训之前的轮次）
+    history = read_history(history_path)  # LOAD_MODEL加载的权重可能没有训练历史
+    val_loss = history['val_loss'].values
+    final_val_loss = float(val_loss[-1]) if len(val_loss) else float("nan")
+
+    # 预测结果
+    predicted_rr_test = model.predict(test_ds, verbose=verbose).squeeze()
+    rr_in_test = np.array(y_test).squeeze()
+
+    # 打印当前折次和重复训练的结果
+    print("[ fold_index-"+str(fold_index)+"(repeat" +str(repeat_index)+") Respiratory Rate Prediction Ends ]")
+    print("val_loss:" + str(round(final_val_loss,2)))  # 打印验证集的最终损失
+    metrics = batch_metrics(rr_in_test, predicted_rr_test)
+    result = {"fold": fold_index, "repeat": repeat_index, "seed": seed_value,
+              "val_loss": final_val_loss,
+              "samples_per_s": float(history['samples_per_s'].mean()) if len(history) else float("nan"),  # 平均训练吞吐量
+              "mae": float(metrics["mae"]),  # 测试集MAE
+              "e": float(metrics["e"]),  # 测试集E指标（MAE/平均RR，不先取整）
+              "pcc": float(metrics["pcc"]),  # 测试集PCC（皮尔逊相关系数）
+              "loa": (float(metrics["loa_low"]), float(metrics["loa_high"])),  # 测试集LOA（差异分析）
+              "rr_true": rr_in_test, "rr_pred": predicted_rr_test,  # 测试集预测（用于汇总各折）
+              "subject": patient_id[test_index]}
+    print("test mae:", result["mae"])
+    print("test e:", result["e"])
+    print("test pcc:", result["pcc"])
+    print("test loa:", result["loa"])
+
+    # 知识蒸馏：相同的折划分，学生模型同时拟合真实标签和教师预测
+    if DISTILL:
+        student = TransRR(250, **MODEL_CONFIGS[STUDENT_CONFIG])
+        distill_result = distill(model, student, raw_data, train_index, val_index, test_index, WIN_SIZE,
+                                 DOWN_SAMPLING_GRADE, BATCH_SIZE, EPOCHS, LR, DISTILL_ALPHA, verbose)
+        print(distill_report(distill_result))
+        result["distill"] = distill_result
+
+    # 导出模型（INT8用训练集中随机抽取的下采样窗口校准），并对比大小、CPU延迟和MAE
+    if EXPORT_MODEL:
+        out_dir = os.path.join(EXPORT_DIR, "fold{}_repeat{}".format(fold_index, repeat_index))
+        representative = representative_dataset(raw_data, train_index, WIN_SIZE, DOWN_SAMPLING_GRADE)
+        report = export_model(model, out_dir, test_ds, representative, EXPORT_QUANTIZATIONS)
+        print(export_report(report))
+        result["export"] = report
+    save_run(run_dir, result)  # metrics.json最后写入，标记该折已完成
+    return result
+
+
+if __name__ == "__main__":
+    # 打印开始信息
+    print("[  Respiratory Rate Prediction Starts  ]")
+
+    # 首次运行时解析CSV并写入缓存，之后各折（各进程）直接内存映射
+    load_csv(WIN_SIZE, csv_path)
+
+    # 每折、每次重复使用独立的随机种子
+    jobs = [(fold_index, repeat_index, np.random.randint(MAX))
+            for fold_index in range(FOLD_NUM) for repeat_index in range(REPEAT_NUM)]
+
+    # 进行K折交叉验证
+    if PARALLEL_WORKERS > 1:
+        results = run_parallel(train_fold, jobs, PARALLEL_WORKERS, THREADS_PER_WORKER)
+    else:
+        results = [train_fold(*job) for job in jobs]
+
+    # 汇总各折结果
+    print(fold_report(results))
+
+    # 每次重复的各折测试集合并，给出bootstrap置信区间和逐受试者指标。
+    # 每折测试int(受试者数/FOLD_NUM)个受试者，余下的受试者数%FOLD_NUM个（如BIDMC 53个中的3个）
+    # 不出现在任何测试集中，不计入合并指标，报告中列出这些受试者。
+    patient_id, _ = load_csv(WIN_SIZE, csv_path)
+    for repeat_index in range(REPEAT_NUM):
+        runs = [r for r in results if r["repeat"] == repeat_index]
+        print("[ repeat {} pooled over folds ]".format(repeat_index))
+        print(metrics_report(np.concatenate([r["rr_true"] for r in runs]), np.concatenate([r["rr_pred"] for r in runs]),
+                             np.concatenate([r["subject"] for r in runs]), all_subjects=patient_id))
+
+    # 打印所有训练完成的信息
+    print("[ ALL Respiratory Rate Prediction Ends ]")
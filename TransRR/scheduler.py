@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+THREAD_ENV = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS",
+              "TF_NUM_INTRAOP_THREADS", "TF_NUM_INTEROP_THREADS")
+
+def _init_worker(threads):
+    for name in THREAD_ENV:
+        os.environ[name] = str(threads)
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(2)
+
+# Run fn(*job) for every job in a spawn-based process pool. Each worker is limited to
+# threads_per_worker threads so that `workers` folds share the cores instead of fighting
+# over them. fn must be importable from a worker (module level, script body guarded by
+# __main__) and should read the dataset through the memory-mapped cache of load_csv.
+def run_parallel(fn, jobs, workers, threads_per_worker=None):
+    threads = threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+    saved = {name: os.environ.get(name) for name in THREAD_ENV}
+    for name in THREAD_ENV:
+        os.environ[name] = str(threads)
+    results = []
+    try:
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                                 initializer=_init_worker, initargs=(threads,)) as executor:
+            futures = {executor.submit(fn, *job): job for job in jobs}
+            for future in as_completed(futures):
+                result = future.result()
+                print("job " + str(futures[future]) + " done")
+                results.append(result)
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+    return sorted(results, key=lambda r: (r["fold"], r["repeat"]))
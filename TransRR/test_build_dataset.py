@@ -0,0 +1,32 @@
+import numpy as np
+from scipy.signal import butter, sosfiltfilt
+from build_dataset import build_subject
+from preprocessing import FS, LOW_CUT, HIGH_CUT, FILTER_ORDER
+
+def _record(seconds=48, rr=15.0, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(seconds * FS) / FS
+    resp = np.sin(2 * np.pi * rr / 60 * t)
+    return {"subject": "s01", "ecg_fs": FS, "ppg_fs": FS, "rr_t": np.arange(seconds, dtype=float),
+            "rr": np.full(seconds, rr), "ecg": np.sin(2 * np.pi * 1.2 * t) * (1 + 0.3 * resp) + 0.05 * rng.normal(size=len(t)),
+            "ppg": np.sin(2 * np.pi * 1.2 * t + 1) + 0.5 * resp}
+
+def test_readme_order_windows_the_zscored_record():
+    record = _record()
+    _, rows = build_subject(record, win_size=16 * FS, hop_size=2 * FS, use_vmd=False)
+    # without VMD the README order is: zero-phase band-pass, z-score of the whole record, windows
+    sos = butter(FILTER_ORDER, [LOW_CUT, HIGH_CUT], btype='bandpass', fs=FS, output='sos')
+    ecg = sosfiltfilt(sos, record["ecg"] - record["ecg"].mean())
+    ecg = (ecg - ecg.mean()) / ecg.std()
+    assert rows.shape == (17, 2 * 16 * FS + 1)
+    np.testing.assert_allclose(rows[3, :16 * FS], ecg[6 * FS:22 * FS], atol=1e-5)
+    np.testing.assert_allclose(rows[:, -1], 15.0)
+
+def test_screen_and_live_order():
+    record = _record()
+    record["rr"][30:] = 40  # the last windows average above MAX_RR and are screened out
+    _, readme = build_subject(record, win_size=16 * FS, hop_size=2 * FS)
+    _, live = build_subject(record, win_size=16 * FS, hop_size=2 * FS, live_order=True)
+    assert len(readme) == len(live) > 0
+    assert np.all(readme[:, -1] < 30)
+    assert np.isfinite(readme).all() and np.isfinite(live).all()
@@ -0,0 +1,22 @@
+import numpy as np
+import pandas as pd
+import pytest
+from make_dataset import fold_n, fold_n_index
+
+def _rows(n_subjects=23, seed=0):
+    # subject ids in recording order with a varying number of windows each; the value is the row number
+    rng = np.random.default_rng(seed)
+    ids = np.repeat(["s{:02d}".format(i) for i in range(n_subjects)], rng.integers(1, 6, n_subjects))
+    return ids, [[s, float(i)] for i, s in enumerate(ids)]
+
+@pytest.mark.parametrize("fold_num", [-1, -2, 5, 10])
+def test_fold_n_index_matches_fold_n(monkeypatch, fold_num):
+    # fold_n was written for older releases: it uses the removed np.float alias and pd.unique on a list
+    monkeypatch.setattr(np, "float", float, raising=False)
+    unique = pd.unique
+    monkeypatch.setattr(pd, "unique", lambda values: unique(np.asarray(values)))
+    ids, raw_data = _rows()
+    for fold_index in range(max(fold_num, 1)):
+        expected = fold_n(fold_index, raw_data, fold_num)
+        for index, split in zip(fold_n_index(fold_index, ids, fold_num), expected):
+            np.testing.assert_array_equal(index, np.ravel(split).astype(int))
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+
+keras = pytest.importorskip("keras")
+pytest.importorskip("tensorflow")
+from make_model import TransRR, MODEL_CONFIGS
+
+@pytest.mark.parametrize("policy", ["mixed_float16", "mixed_bfloat16"])
+def test_transrr_builds_under_mixed_precision(policy):
+    keras.mixed_precision.set_global_policy(policy)
+    try:
+        model = TransRR(250, **MODEL_CONFIGS["tiny"])
+        x = np.random.default_rng(0).normal(size=(2, 250, 1)).astype(np.float32)
+        y = model([x, x], training=False)
+        assert model.outputs[0].dtype == "float32"
+        assert y.shape == (2, 1)
+        assert np.all(np.isfinite(np.asarray(y)))
+    finally:
+        keras.mixed_precision.set_global_policy("float32")
@@ -0,0 +1,31 @@
+import numpy as np
+from metrics import bootstrap_ci, metrics_report, _weighted_metrics, _subject_sums, _metrics_from_sums, METRICS
+
+def _clustered(n_subjects=20, seed=0):
+    # every subject has its own offset, so windows of one subject are strongly correlated
+    rng = np.random.default_rng(seed)
+    subject = np.repeat(np.arange(n_subjects), rng.integers(20, 60, n_subjects))
+    y_true = 15 + rng.normal(0, 3, n_subjects)[subject] + rng.normal(0, 0.5, len(subject))
+    y_pred = y_true + rng.normal(0, 2, n_subjects)[subject] + rng.normal(0, 0.5, len(subject))
+    return y_true, y_pred, subject
+
+def test_subject_sums_match_weighted_windows():
+    y_true, y_pred, subject = _clustered()
+    _, sums = _subject_sums(y_true[None], y_pred[None], subject)
+    counts = np.random.default_rng(1).multinomial(20, np.full(20, 1 / 20))
+    expected = _weighted_metrics(y_true, y_pred, counts[subject].astype(float))
+    got = _metrics_from_sums(counts @ sums[0])
+    for name in METRICS:
+        np.testing.assert_allclose(got[name], expected[name])
+
+def test_subject_bootstrap_is_wider_than_window_bootstrap():
+    y_true, y_pred, subject = _clustered()
+    window = bootstrap_ci(y_true, y_pred, n_boot=500)["mae"]
+    cluster = bootstrap_ci(y_true, y_pred, n_boot=500, subject=subject)["mae"]
+    assert cluster[1] - cluster[0] > 2 * (window[1] - window[0])
+
+def test_report_uses_subject_bootstrap():
+    y_true, y_pred, subject = _clustered()
+    report = metrics_report(y_true, y_pred, subject, n_boot=200)
+    low, high = bootstrap_ci(y_true, y_pred, n_boot=200, subject=subject)["mae"]
+    assert "[{:7.3f}, {:7.3f}]".format(low, high) in report.splitlines()[0]
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+from preprocessing import StreamingBandpass, RunningZScore, preprocess_record, FS
+
+def _record(seconds=60, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(seconds * FS) / FS
+    return 3 + np.sin(2 * np.pi * 0.25 * t) + 0.2 * rng.normal(size=len(t))
+
+def _live(x, chunk_size):
+    bandpass, zscore = StreamingBandpass(), RunningZScore()
+    return np.concatenate([zscore.process(bandpass.process(x[i:i + chunk_size]))
+                           for i in range(0, len(x), chunk_size)])
+
+def test_bandpass_does_not_depend_on_chunking():
+    x = _record()
+    whole = StreamingBandpass().process(x)
+    bandpass = StreamingBandpass()
+    chunked = np.concatenate([bandpass.process(x[i:i + 37]) for i in range(0, len(x), 37)])
+    np.testing.assert_allclose(chunked, whole, atol=1e-10)
+
+def test_live_matches_offline_with_same_chunks():
+    x = _record()
+    np.testing.assert_allclose(_live(x, 250), preprocess_record(x, chunk_size=250), atol=1e-10)
+
+def test_live_differs_from_whole_record_zscore():
+    # the running z-score normalises early chunks with early statistics only
+    x = _record()
+    live = _live(x, 250)
+    offline = preprocess_record(x)
+    assert not np.allclose(live[:250], offline[:250], atol=1e-3)
+    np.testing.assert_allclose(live[-250:], offline[-250:], atol=1e-10)
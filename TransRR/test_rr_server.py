@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+import time
+import numpy as np
+import pytest
+from rr_server import MicroBatcher, RemotePredictor
+
+def test_short_predict_fn_fails_requests_immediately():
+    batcher = MicroBatcher(lambda x1, x2: np.zeros((len(x1) - 1, 1)), win_size=4, max_wait=0.05)
+    batcher.start()
+    try:
+        start = time.perf_counter()
+        with pytest.raises(RuntimeError):
+            batcher.submit("bed1", np.zeros(4), np.zeros(4), timeout=5.0)
+        assert time.perf_counter() - start < 1.0
+    finally:
+        batcher.stop()
+
+def test_remote_predictor_returns_nan_when_server_is_down():
+    predictor = RemotePredictor("http://127.0.0.1:9", "bed1", timeout=0.5)  # discard port, nothing listens
+    rr = predictor(np.zeros((2, 4, 1)), np.zeros((2, 4, 1)))
+    assert rr.shape == (2, 1)
+    assert np.isnan(rr).all()
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+import os
+import pandas as pd
+import pytest
+
+pytest.importorskip("keras")
+pytest.importorskip("tensorflow")
+from train_utils import read_history, truncate_history
+
+def test_missing_history_is_empty(tmp_path):
+    history = read_history(os.path.join(tmp_path, "history.csv"))
+    assert len(history) == 0
+    assert {"loss", "val_loss"} <= set(history.columns)
+
+def test_truncate_history_drops_epochs_after_checkpoint(tmp_path):
+    path = os.path.join(tmp_path, "history.csv")
+    truncate_history(path, 2)  # no file yet
+    assert not os.path.exists(path)
+    # epoch 2 was logged but its checkpoint was never saved
+    pd.DataFrame({"epoch": [0, 1, 2], "loss": [3.0, 2.0, 1.0], "val_loss": [3.5, 2.5, 1.5]}).to_csv(path, index=False)
+    truncate_history(path, 2)
+    assert read_history(path)["epoch"].tolist() == [0, 1]
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import time
+import keras
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+
+def _cpu_has_bf16():
+    try:
+        with open("/proc/cpuinfo") as f:
+            flags = f.read()
+    except OSError:
+        return False
+    return "avx512_bf16" in flags or "amx_bf16" in flags
+
+# Set the global Keras dtype policy: "float32", "mixed_float16" or "mixed_bfloat16".
+# float16 is only fast on GPUs, so on a CPU-only machine it is replaced by bfloat16, and
+# bfloat16 is only kept when the CPU has native bf16 instructions. Returns the policy used.
+def set_precision(precision="float32"):
+    on_gpu = len(tf.config.list_physical_devices("GPU")) > 0
+    if precision == "mixed_float16" and not on_gpu:
+        print("mixed_float16 needs a GPU, trying mixed_bfloat16 on CPU")
+        precision = "mixed_bfloat16"
+    if precision == "mixed_bfloat16" and not on_gpu and not _cpu_has_bf16():
+        print("CPU has no native bfloat16 support, training in float32")
+        precision = "float32"
+    keras.mixed_precision.set_global_policy(precision)
+    return precision
+
+# Adam with dynamic loss scaling under mixed_float16, plain Adam otherwise
+def make_optimizer(lr, precision="float32"):
+    optimizer = keras.optimizers.Adam(learning_rate=lr)
+    if precision == "mixed_float16":
+        optimizer = keras.mixed_precision.LossScaleOptimizer(optimizer)
+    return optimizer
+
+# Logs wall-clock time of every epoch and training throughput (also added to history).
+# samples_per_s only counts the training pass: the clock stops when validation starts,
+# and the validation time is logged separately as val_time.
+class EpochTimer(keras.callbacks.Callback):
+    def __init__(self, samples_per_epoch):
+        super().__init__()
+        self.samples_per_epoch = samples_per_epoch
+        self.start = None
+        self.train_end = None
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self.start = time.perf_counter()
+        self.train_end = None
+
+    def on_test_begin(self, logs=None):
+        if self.start is not None and self.train_end is None:
+            self.train_end = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        end = time.perf_counter()
+        train_end = self.train_end or end
+        train_time = train_end - self.start
+        samples_per_s = self.samples_per_epoch / train_time
+        if logs is not None:
+            logs["epoch_time"] = end - self.start
+            logs["train_time"] = train_time
+            logs["val_time"] = end - train_end
+            logs["samples_per_s"] = samples_per_s
+        print("epoch {}: {:.1f} s (train {:.1f} s, val {:.1f} s), {:.0f} samples/s".format(
+            epoch + 1, end - self.start, train_time, end - train_end, samples_per_s))
+        self.start = None
+
+def _checkpoint(model, epoch):
+    return tf.train.Checkpoint(model=model, optimizer=model.optimizer, epoch=epoch)
+
+# Saves model weights, optimizer state (incl. learning rate) and the number of finished epochs
+# after every epoch, keeping only the latest checkpoint.
+class EpochCheckpoint(keras.callbacks.Callback):
+    def __init__(self, ckpt_dir):
+        super().__init__()
+        self.ckpt_dir = ckpt_dir
+        self.epoch = tf.Variable(0, dtype=tf.int64)
+        self.manager = None
+
+    def on_epoch_end(self, epoch, logs=None):
+        if self.manager is None:
+            self.manager = tf.train.CheckpointManager(_checkpoint(self.model, self.epoch), self.ckpt_dir, max_to_keep=1)
+        self.epoch.assign(epoch + 1)
+        self.manager.save()
+
+# Restore the latest EpochCheckpoint into a compiled model; returns the epoch to continue from
+def restore_checkpoint(model, ckpt_dir):
+    latest = tf.train.latest_checkpoint(ckpt_dir)
+    if latest is None:
+        return 0
+    if hasattr(model.optimizer, "build"):
+        model.optimizer.build(model.trainable_variables)  # create slots so they are restored too
+    epoch = tf.Variable(0, dtype=tf.int64)
+    _checkpoint(model, epoch).restore(latest).expect_partial()
+    print("resumed from {} (epoch {})".format(latest, int(epoch)))
+    return int(epoch)
+
+# history.csv as a DataFrame; empty (with the loss columns) when the run has none, e.g.
+# weights loaded with LOAD_MODEL into a run directory that was never trained here
+def read_history(history_path):
+    if not os.path.exists(history_path):
+        return pd.DataFrame(columns=["epoch", "loss", "val_loss", "samples_per_s"])
+    return pd.read_csv(history_path)
+
+# Drop the rows of epochs at or after the restored checkpoint before CSVLogger appends again:
+# a crash between the CSVLogger write and the checkpoint save would otherwise log that epoch twice
+def truncate_history(history_path, epochs):
+    if not os.path.exists(history_path):
+        return
+    history = pd.read_csv(history_path)
+    if (history["epoch"] >= epochs).any():
+        history[history["epoch"] < epochs].to_csv(history_path, index=False)
+
+# Run directory of one fold/repeat:
+#   run.json         fold, repeat and seed (written first, reused on resume)
+#   ckpt/            latest epoch checkpoint
+#   history.csv      per-epoch logs
+#   model.weights.h5 weights after training
+#   predictions.npz  test labels, predictions and subject ids
+#   metrics.json     results, written last: the run is finished once it exists
+ARRAY_KEYS = ("rr_true", "rr_pred", "subject")
+
+def start_run(run_dir, fold_index, repeat_index, seed_value, resume=False):
+    os.makedirs(run_dir, exist_ok=True)
+    path = os.path.join(run_dir, "run.json")
+    if resume and os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)["seed"]
+    with open(path, "w") as f:
+        json.dump({"fold": fold_index, "repeat": repeat_index, "seed": int(seed_value)}, f)
+    return seed_value
+
+def run_finished(run_dir):
+    return os.path.exists(os.path.join(run_dir, "metrics.json"))
+
+def _to_json(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(type(value))
+
+def save_run(run_dir, result):
+    np.savez(os.path.join(run_dir, "predictions.npz"), **{k: result[k] for k in ARRAY_KEYS})
+    tmp = os.path.join(run_dir, "metrics.json.tmp")
+    with open(tmp, "w") as f:
+        json.dump({k: v for k, v in result.items() if k not in ARRAY_KEYS}, f, indent=1, default=_to_json)
+    os.replace(tmp, os.path.join(run_dir, "metrics.json"))
+
+def load_run(run_dir):
+    with open(os.path.join(run_dir, "metrics.json")) as f:
+        result = json.load(f)
+    result["loa"] = tuple(result["loa"])
+    with np.load(os.path.join(run_dir, "predictions.npz")) as arrays:
+        result.update({k: arrays[k] for k in ARRAY_KEYS})
+    return result
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+# Variational mode decomposition (Dragomiretskiy & Zosso, 2014) for a batch of windows.
+# All windows are updated together in the frequency domain: the ADMM loop runs over
+# arrays of shape (batch, K, n_freq) on the one-sided spectrum of the mirrored signal,
+# and windows that have converged drop out of the remaining iterations.
+#
+# x:          (n,) or (batch, n) signal windows
+# K:          number of modes
+# alpha:      bandwidth constraint
+# tau:        dual ascent step (0 = noise slack, as in the usual VMD setup)
+# omega_init: (K,) or (batch, K) initial center frequencies in cycles/sample (0..0.5),
+#             e.g. the omega returned for the previous overlapping window; None spreads
+#             them uniformly over [0, 0.5)
+# returns modes (batch, K, n) sorted by center frequency, and omega (batch, K)
+def vmd(x, K=4, alpha=2000, tau=0.0, tol=1e-7, max_iter=500, omega_init=None, dc=False):
+    x = np.asarray(x, dtype=float)
+    squeeze = x.ndim == 1
+    x = np.atleast_2d(x)
+    batch, n = x.shape
+
+    # mirror both halves to reduce boundary effects
+    half = n // 2
+    x_mirror = np.concatenate([x[:, :half][:, ::-1], x, x[:, n - half:][:, ::-1]], axis=1)
+    T = x_mirror.shape[1]
+    f_hat = np.fft.rfft(x_mirror, axis=1)
+    freqs = np.arange(f_hat.shape[1]) / T
+
+    if omega_init is None:
+        omega = np.tile(0.5 / K * np.arange(K), (batch, 1))
+    else:
+        omega = np.array(np.broadcast_to(omega_init, (batch, K)), dtype=float)
+    if dc:
+        omega[:, 0] = 0
+
+    u_hat = np.zeros((batch, K, len(freqs)), dtype=complex)
+    u_sum = np.zeros((batch, len(freqs)), dtype=complex)
+    lam = np.zeros((batch, len(freqs)), dtype=complex)
+    active = np.arange(batch)
+
+    for _ in range(max_iter):
+        u_a, s_a, f_a, l_a, w_a = u_hat[active], u_sum[active], f_hat[active], lam[active], omega[active]
+        u_old = u_a.copy()
+        for k in range(K):
+            # Wiener filter update of mode k given the current estimate of all other modes
+            others = s_a - u_a[:, k]
+            u_k = (f_a - others - l_a / 2) / (1 + alpha * (freqs - w_a[:, k, None]) ** 2)
+            s_a = others + u_k
+            u_a[:, k] = u_k
+            if not (dc and k == 0):
+                power = np.abs(u_k) ** 2
+                w_a[:, k] = power @ freqs / np.maximum(power.sum(axis=1), 1e-300)
+        l_a = l_a + tau * (s_a - f_a)
+
+        u_hat[active], u_sum[active], lam[active], omega[active] = u_a, s_a, l_a, w_a
+        diff = np.sum(np.abs(u_a - u_old) ** 2, axis=(1, 2)) / T
+        active = active[diff > tol]
+        if len(active) == 0:
+            break
+
+    modes = np.fft.irfft(u_hat, n=T, axis=2)[:, :, half:half + n]
+    order = np.argsort(omega, axis=1)
+    modes = np.take_along_axis(modes, order[:, :, None], axis=1)
+    omega = np.take_along_axis(omega, order, axis=1)
+    if squeeze:
+        return modes[0], omega[0]
+    return modes, omega
+
+# README step (3): decompose and drop the highest-frequency mode(s)
+def vmd_remove_last(x, K=4, drop=1, **kwargs):
+    modes, omega = vmd(x, K=K, **kwargs)
+    return modes[..., :K - drop, :].sum(axis=-2), omega
+
+# Batched VMD over consecutive overlapping windows: windows are decomposed chunk_size at a
+# time and every chunk is warm-started from the center frequencies of the last window of
+# the previous chunk, which is close in time and usually close in spectrum.
+def vmd_remove_last_windows(windows, K=4, drop=1, chunk_size=256, omega_init=None, **kwargs):
+    out = np.empty(np.shape(windows), dtype=float)
+    omega = omega_init
+    for start in range(0, len(windows), chunk_size):
+        stop = start + chunk_size
+        out[start:stop], omegas = vmd_remove_last(windows[start:stop], K=K, drop=drop,
+                                                  omega_init=omega, **kwargs)
+        omega = omegas[-1]
+    return out, omega
+
+# Streaming use: keep the center frequencies of the previous window as the next start point.
+# Used per channel by the live RRInferenceEngine (图形界面/rr_engine.py ChannelPipeline).
+class StreamingVMD:
+    def __init__(self, K=4, drop=1, **kwargs):
+        self.K = K
+        self.drop = drop
+        self.kwargs = kwargs
+        self.omega = None
+
+    def process(self, window):
+        y, self.omega = vmd_remove_last(window, K=self.K, drop=self.drop, omega_init=self.omega, **self.kwargs)
+        return y
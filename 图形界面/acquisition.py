@@ -0,0 +1,168 @@
+import asyncio
+import collections
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import serial
+
+
+class SerialSource:
+    """一路串口数据源：parse把读到的字节解析为一批采样（如ADS1292RParser().feed）。"""
+
+    def __init__(self, name, port, baudrate, parse, timeout=0.1):
+        self.name = name
+        self.port = port
+        self.baudrate = baudrate
+        self.parse = parse
+        self.timeout = timeout
+        self.ser = None
+        self.error = None
+
+    def open(self):
+        self.ser = serial.Serial(self.port, self.baudrate, timeout=self.timeout)
+        self.error = None
+
+    def read(self):
+        # 一次读取所有已到达的字节，没有数据时最多阻塞timeout秒（在线程池中执行，不占用事件循环）
+        return self.ser.read(self.ser.in_waiting or 1)
+
+    def close(self):
+        if self.ser is not None and self.ser.is_open:
+            self.ser.close()
+
+
+class AcquisitionCore:
+    """基于asyncio的多路采集：一个后台事件循环线程管理N个数据源。
+
+    每个数据源一个协程，阻塞的串口读取交给线程池（pyserial在Windows上没有可等待的句柄），读取时释放GIL；
+    解析后的一批采样分发给订阅者：
+      - subscribe(callback)：在事件循环线程中直接调用callback(name, batch, t)，用于写环形缓冲区、
+        录制等很快的操作（推理线程从环形缓冲区读取）；
+      - subscribe(callback, tk=True)：放入有界队列，由Tk线程调用poll()时执行，用于更新界面控件。
+    t为读到这批字节时的time.monotonic()。stop()先让所有读取协程结束，再关闭串口，不会在读取过程中关闭端口。
+    读取或解析出错的数据源记录在errors中并停止读取；订阅者的异常只记录在subscriber_errors中，不影响采集。
+    """
+
+    def __init__(self, sources=(), tk_queue_size=1024):
+        self.sources = {}
+        self.subscribers = []
+        self.tk_subscribers = []
+        self.tk_queue = collections.deque(maxlen=tk_queue_size)  # Tk线程卡顿时丢弃最旧的批次
+        self.loop = None
+        self.thread = None
+        self.stop_event = None
+        self.ready = threading.Event()
+        self.error = None  # 事件循环线程的异常（启动失败或运行中退出）
+        self.subscriber_errors = {}  # 订阅者 -> 最近一次异常
+        self.is_running = False
+        for source in sources:
+            self.add_source(source)
+
+    def add_source(self, source):
+        if self.is_running:
+            raise RuntimeError("cannot add a source while running")
+        self.sources[source.name] = source
+
+    def subscribe(self, callback, source=None, tk=False):
+        # source为None时接收所有数据源的批次
+        (self.tk_subscribers if tk else self.subscribers).append((source, callback))
+
+    @property
+    def errors(self):
+        errors = {name: source.error for name, source in self.sources.items() if source.error is not None}
+        if self.error is not None:
+            errors['acquisition'] = self.error
+        return errors
+
+    def start(self, timeout=5.0):
+        # 在调用线程中打开所有串口，打开失败时抛出异常并关闭已打开的端口
+        try:
+            for source in self.sources.values():
+                source.open()
+        except Exception:
+            for source in self.sources.values():
+                source.close()
+            raise
+        self.is_running = True
+        self.error = None
+        self.subscriber_errors = {}
+        self.ready.clear()
+        self.thread = threading.Thread(target=self._thread_main, daemon=True)
+        self.thread.start()
+        # 事件循环启动失败时ready也会被设置，不会一直等待；失败或超时时关闭串口并抛出异常
+        if not self.ready.wait(timeout) or self.error is not None:
+            error = self.error or TimeoutError(f"acquisition loop did not start within {timeout} s")
+            self.is_running = False
+            if self.loop is not None and self.stop_event is not None:
+                self.loop.call_soon_threadsafe(self.stop_event.set)
+            for source in self.sources.values():
+                source.close()
+            raise error
+
+    def stop(self):
+        if not self.is_running:
+            return
+        self.is_running = False
+        if self.thread.is_alive():  # 事件循环异常退出后loop已关闭
+            self.loop.call_soon_threadsafe(self.stop_event.set)
+        self.thread.join()
+        self.tk_queue.clear()
+
+    def poll(self):
+        # 在Tk线程中调用（如每次刷新界面时），执行tk=True的订阅者
+        while self.tk_queue:
+            name, batch, t = self.tk_queue.popleft()
+            self._dispatch(self.tk_subscribers, name, batch, t)
+
+    def _thread_main(self):
+        try:
+            asyncio.run(self._main())
+        except Exception as e:
+            self.error = e
+        finally:
+            self.ready.set()
+
+    async def _main(self):
+        self.loop = asyncio.get_running_loop()
+        self.stop_event = asyncio.Event()
+        executor = ThreadPoolExecutor(max_workers=max(1, len(self.sources)), thread_name_prefix="acquisition")
+        tasks = [asyncio.create_task(self._read_source(source, executor)) for source in self.sources.values()]
+        self.ready.set()
+        try:
+            await self.stop_event.wait()
+            await asyncio.gather(*tasks)
+        finally:
+            executor.shutdown(wait=True)
+            for source in self.sources.values():
+                source.close()
+
+    async def _read_source(self, source, executor):
+        while not self.stop_event.is_set():
+            try:
+                data = await self.loop.run_in_executor(executor, source.read)
+                if not data:
+                    continue
+                batch = source.parse(data)
+            except Exception as e:
+                # 设备拔出、解析出错等：记录后停止读取这一路，其余数据源继续
+                source.error = e
+                return
+            if len(batch) == 0:
+                continue
+            t = time.monotonic()
+            self._dispatch(self.subscribers, source.name, batch, t)
+            if self.tk_subscribers:
+                self.tk_queue.append((source.name, batch, t))
+
+    def _dispatch(self, subscribers, name, batch, t):
+        # 每个订阅者单独捕获异常（如录制时磁盘已满），一个出错的订阅者不会中断采集和其他订阅者；
+        # 每个订阅者的第一次异常打印出来，最近一次记录在subscriber_errors中
+        for source, callback in subscribers:
+            if source is None or source == name:
+                try:
+                    callback(name, batch, t)
+                except Exception as e:
+                    if callback not in self.subscriber_errors:
+                        print(f"subscriber {getattr(callback, '__qualname__', callback)} failed on {name}: {e!r}")
+                    self.subscriber_errors[callback] = e
@@ -0,0 +1,179 @@
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+from itertools import repeat
+
+import numpy as np
+
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rr.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    device TEXT,
+    started REAL NOT NULL,
+    ended REAL
+);
+CREATE TABLE IF NOT EXISTS rr (
+    session TEXT NOT NULL,
+    ts REAL NOT NULL,
+    source TEXT NOT NULL,  -- 'device': ADS1292R, 'model': TransRR
+    rr REAL NOT NULL,
+    hr REAL
+);
+CREATE TABLE IF NOT EXISTS samples (
+    session TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    ts REAL NOT NULL,
+    value REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS rr_session_ts ON rr (session, ts);
+CREATE INDEX IF NOT EXISTS samples_session_ts ON samples (session, channel, ts);
+"""
+
+
+def connect(path=DB_PATH):
+    conn = sqlite3.connect(path, timeout=10)
+    conn.execute("PRAGMA journal_mode=WAL")  # 写入时界面仍可读取
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+class DBSink:
+    """批量写入的SQLite（WAL）存储：采集/推理线程只把记录追加到内存列表，
+    后台线程每flush_interval秒、或积累max_pending条时，在一个事务中executemany写入。
+
+    时间统一存为time.time()秒；add_*接收的是time.monotonic()时间（与采集和推理引擎一致），内部换算。
+    原始波形默认不入库（由recorder.py录制），store_samples=True时也写入samples表。
+    """
+
+    def __init__(self, path=DB_PATH, flush_interval=1.0, max_pending=5000, store_samples=False):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.store_samples = store_samples
+        self.clock_offset = time.time() - time.monotonic()
+        self.lock = threading.Lock()
+        self.pending = {"sessions": [], "ended": [], "rr": [], "samples": []}
+        self.n_pending = 0
+        self.wakeup = threading.Event()
+        self.is_running = True
+        self.flushes = 0
+        self.rows_written = 0
+        self.rows_dropped = 0
+        self.error = None  # 最近一次写入失败的异常
+        connect(path).close()  # 在调用线程中建表，路径错误时立即报错
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _queue(self, table, rows):
+        with self.lock:
+            self.pending[table].extend(rows)
+            self.n_pending += len(rows)
+            full = self.n_pending >= self.max_pending
+        if full:
+            self.wakeup.set()
+
+    def start_session(self, session, device=None):
+        self._queue("sessions", [(session, device, time.time())])
+
+    def end_session(self, session):
+        self._queue("ended", [(time.time(), session)])
+
+    def add_rr(self, session, t, rr, source="model", hr=None):
+        self._queue("rr", [(session, t + self.clock_offset, source, float(rr), None if hr is None else float(hr))])
+
+    def add_samples(self, session, channel, t, values):
+        if not self.store_samples:
+            return
+        values = np.atleast_1d(values)
+        t = np.broadcast_to(np.asarray(t, dtype=np.float64) + self.clock_offset, values.shape)
+        self._queue("samples", list(zip(repeat(session), repeat(channel), t.tolist(), values.tolist())))
+
+    def subscribe_to(self, acquisition, session, ecg='ecg', ppg='ppg'):
+        # 每批ADS1292R数据记录一次设备给出的呼吸频率和心率
+        def on_ecg(name, frames, t):
+            self.add_rr(session, t, frames[-1, 2], "device", frames[-1, 3])
+            self.add_samples(session, name, t, frames[:, 0])
+
+        acquisition.subscribe(on_ecg, ecg)
+        acquisition.subscribe(lambda name, values, t: self.add_samples(session, name, t, values), ppg)
+
+    def flush(self, conn):
+        with self.lock:
+            pending = self.pending
+            self.pending = {table: [] for table in pending}
+            self.n_pending = 0
+        n = sum(len(rows) for rows in pending.values())
+        if n == 0:
+            return
+        try:
+            with conn:  # 一个事务，失败时整批回滚
+                conn.executemany("INSERT OR IGNORE INTO sessions (id, device, started) VALUES (?, ?, ?)",
+                                 pending["sessions"])
+                conn.executemany("INSERT INTO rr (session, ts, source, rr, hr) VALUES (?, ?, ?, ?, ?)", pending["rr"])
+                conn.executemany("INSERT INTO samples (session, channel, ts, value) VALUES (?, ?, ?, ?)",
+                                 pending["samples"])
+                conn.executemany("UPDATE sessions SET ended = ? WHERE id = ?", pending["ended"])
+        except Exception as e:
+            # 磁盘已满、数据库被锁定等：记录并丢弃这一批，写入线程继续运行
+            self.error = e
+            self.rows_dropped += n
+            print(f"DBSink: dropped {n} rows: {e!r}")
+            return
+        self.flushes += 1
+        self.rows_written += n
+
+    def _run(self):
+        conn = connect(self.path)
+        try:
+            while self.is_running:
+                self.wakeup.wait(self.flush_interval)
+                self.wakeup.clear()
+                self.flush(conn)
+            self.flush(conn)
+        finally:
+            conn.close()
+
+    def close(self):
+        self.is_running = False
+        self.wakeup.set()
+        self.thread.join()
+
+
+class SessionDB:
+    """数据页使用的只读查询（WAL模式下可与DBSink同时使用）。
+
+    以只读方式打开，不执行PRAGMA和建表；数据库文件不存在时才先建一个空库。
+    """
+
+    def __init__(self, path=DB_PATH):
+        if not os.path.exists(path):
+            connect(path).close()
+        self.conn = sqlite3.connect(pathlib.Path(path).absolute().as_uri() + "?mode=ro", uri=True, timeout=10)
+
+    def list_sessions(self, limit=100):
+        # (id, device, started, ended, 模型估计数, 平均呼吸频率)
+        return self.conn.execute(
+            "SELECT s.id, s.device, s.started, s.ended, COUNT(r.rr), AVG(r.rr) FROM sessions s "
+            "LEFT JOIN rr r ON r.session = s.id AND r.source = 'model' "
+            "GROUP BY s.id ORDER BY s.started DESC LIMIT ?", (limit,)).fetchall()
+
+    def session_rr(self, session, source="model", t_start=None, t_end=None):
+        rows = self.conn.execute(
+            "SELECT ts, rr, hr FROM rr WHERE session = ? AND ts >= ? AND ts < ? AND source = ? ORDER BY ts",
+            (session, -np.inf if t_start is None else t_start, np.inf if t_end is None else t_end, source)).fetchall()
+        return np.array(rows, dtype=np.float64).reshape(-1, 3)
+
+    def session_samples(self, session, channel, t_start=None, t_end=None):
+        rows = self.conn.execute(
+            "SELECT ts, value FROM samples WHERE session = ? AND channel = ? AND ts >= ? AND ts < ? ORDER BY ts",
+            (session, channel, -np.inf if t_start is None else t_start,
+             np.inf if t_end is None else t_end)).fetchall()
+        return np.array(rows, dtype=np.float64).reshape(-1, 2)
+
+    def close(self):
+        self.conn.close()
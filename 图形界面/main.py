@@ -1,7 +1,9 @@
 import tkinter as tk
 from tkinter import ttk
 import os
+import time
 import subprocess
+from db_sink import SessionDB, DB_PATH
 # ------------------------------------------------------------
 # AnimatedSidebarApp  (No‑slide version)
 # ------------------------------------------------------------
@@ -118,12 +120,57 @@ class AnimatedSidebarApp:
         # 先隐藏所有页
         for pg in self.pages:
             pg.place_forget()
+        self.create_data_page(self.pages[2])
 
     def create_page(self, text, color):
         f = tk.Frame(self.main_canvas, bg=color)
         tk.Label(f, text=text, font=("微软雅黑", 24), bg=color).pack(pady=50)
         return f
 
+    def create_data_page(self, page):
+        # 历史会话列表（show_signal.py写入的SQLite数据库），选中一行显示该会话的呼吸频率统计
+        columns = ("session", "device", "started", "duration", "count", "mean_rr")
+        headings = ("会话", "设备", "开始时间", "时长", "RR估计数", "平均RR")
+        self.session_tree = ttk.Treeview(page, columns=columns, show="headings", height=8)
+        for column, heading in zip(columns, headings):
+            self.session_tree.heading(column, text=heading)
+            self.session_tree.column(column, width=80, anchor="center")
+        self.session_tree.pack(fill=tk.BOTH, expand=True, padx=(50, 10), pady=(0, 5))
+        self.session_tree.bind("<<TreeviewSelect>>", self.show_session_detail)
+        self.session_detail = tk.Label(page, text="", font=("微软雅黑", 10), bg=page["bg"])
+        self.session_detail.pack(pady=(0, 10))
+
+    def load_sessions(self):
+        self.session_tree.delete(*self.session_tree.get_children())
+        db = SessionDB(DB_PATH)
+        try:
+            for session, device, started, ended, count, mean_rr in db.list_sessions():
+                duration = f"{(ended - started) / 60:.1f} min" if ended else "进行中"
+                self.session_tree.insert("", tk.END, iid=session, values=(
+                    session, device or "", time.strftime("%Y-%m-%d %H:%M", time.localtime(started)), duration,
+                    count, f"{mean_rr:.1f}" if mean_rr is not None else "-"))
+        finally:
+            db.close()
+
+    def show_session_detail(self, _=None):
+        selection = self.session_tree.selection()
+        if not selection:
+            return
+        db = SessionDB(DB_PATH)
+        try:
+            model_rr = db.session_rr(selection[0], "model")
+            device_rr = db.session_rr(selection[0], "device")
+        finally:
+            db.close()
+        text = f"TransRR: {len(model_rr)}个估计"
+        if len(model_rr):
+            text += f"，{model_rr[:, 1].min():.1f}~{model_rr[:, 1].max():.1f} brpm"
+        if len(device_rr):
+            # ads1292r.ino中RESP呼吸算法被注释掉，设备的RR全为0时显示为不可用
+            device_mean_rr = f"{device_rr[:, 1].mean():.1f}" if device_rr[:, 1].any() else "不可用"
+            text += f"    ADS1292R: 平均RR {device_mean_rr}，平均心率 {device_rr[:, 2].mean():.0f} bpm"
+        self.session_detail.config(text=text)
+
     # ---------------------- 页面切换（无动画） ----------------------
     def show_page(self, page):
         current = next((p for p in self.pages if p.winfo_viewable()), None)
@@ -164,6 +211,7 @@ class AnimatedSidebarApp:
         subprocess.Popen(["python", script_path], shell=True)
     def show_about(self):
         self.show_page(self.pages[2])
+        self.load_sessions()
 
     def show_docs(self):
         self.show_page(self.pages[3])
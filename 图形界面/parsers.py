@@ -0,0 +1,149 @@
+import numpy as np
+
+# ADS1292R数据包格式（见ads1292r.ino）：
+# 0x0A 0xFA | 长度(2字节,小端) | 类型 | 数据(长度字节) | 0x00 0x0B
+PKT_START_1 = 0x0A
+PKT_START_2 = 0xFA
+PKT_STOP = 0x0B
+PKT_TYPE_DATA = 0x02
+PKT_OVERHEAD = 5
+PKT_MAX_LEN = 256
+DATA_FIELDS = ('ecg', 'resp', 'rr', 'hr')
+
+
+class ADS1292RParser:
+    """批量解析ADS1292R串口字节流。
+
+    feed()接收任意长度的字节，用NumPy一次找出所有完整数据包，并把全部数据区的
+    前8字节按'<i2'一次解码为(n, 4)数组，列依次为ecg, resp, rr, hr（与原
+    handle_ads1292r_data字段一致）；不完整的包保留到下一次feed。
+    """
+
+    def __init__(self, max_buffer=4096):
+        self.buffer = bytearray()
+        self.max_buffer = max_buffer
+        self.packets = 0
+
+    def feed(self, data):
+        self.buffer += data
+        buf = np.frombuffer(bytes(self.buffer), dtype=np.uint8)
+        n = len(buf)
+        empty = np.empty((0, len(DATA_FIELDS)), dtype=np.int16)
+        if n < PKT_OVERHEAD:
+            return empty
+
+        # 候选包头及其长度、类型
+        starts = np.flatnonzero((buf[:-1] == PKT_START_1) & (buf[1:] == PKT_START_2))
+        header_ok = starts + PKT_OVERHEAD <= n
+        complete_starts = starts[header_ok]
+        length = buf[complete_starts + 2].astype(np.int64) | (buf[complete_starts + 3].astype(np.int64) << 8)
+        plausible = length <= PKT_MAX_LEN
+        complete_starts, length = complete_starts[plausible], length[plausible]
+        end = complete_starts + PKT_OVERHEAD + length + 2
+        in_buf = end <= n
+        stop_ok = np.zeros(len(complete_starts), dtype=bool)
+        stop_ok[in_buf] = buf[end[in_buf] - 1] == PKT_STOP
+
+        # 完整且包尾正确的包；数据中恰好出现包头时按顺序去掉重叠的候选
+        valid = np.flatnonzero(stop_ok)
+        frame_start = complete_starts[valid]
+        frame_end = end[valid]
+        frame_type = buf[frame_start + 4]
+        frame_len = length[valid]
+        if len(frame_start) > 1 and np.any(frame_start[1:] < frame_end[:-1]):
+            keep = []
+            last_end = 0
+            for i in range(len(frame_start)):
+                if frame_start[i] >= last_end:
+                    keep.append(i)
+                    last_end = frame_end[i]
+            frame_start, frame_end = frame_start[keep], frame_end[keep]
+            frame_type, frame_len = frame_type[keep], frame_len[keep]
+
+        # 丢弃已处理的字节，保留最后一个未完成的包
+        consumed = int(frame_end[-1]) if len(frame_end) else 0
+        pending = complete_starts[~in_buf & (complete_starts >= consumed)]
+        partial = starts[~header_ok]
+        if len(pending):
+            keep_from = int(pending[0])
+        elif len(partial) and partial[0] >= consumed:
+            keep_from = int(partial[0])
+        elif buf[-1] == PKT_START_1:
+            keep_from = n - 1
+        else:
+            keep_from = n
+        keep_from = max(keep_from, n - self.max_buffer)
+        del self.buffer[:keep_from]
+
+        data = (frame_type == PKT_TYPE_DATA) & (frame_len >= 2 * len(DATA_FIELDS))
+        self.packets += int(np.count_nonzero(data))
+        if not np.any(data):
+            return empty
+        offsets = frame_start[data][:, None] + PKT_OVERHEAD + np.arange(2 * len(DATA_FIELDS))
+        return np.frombuffer(buf[offsets].tobytes(), dtype='<i2').reshape(-1, len(DATA_FIELDS))
+
+
+class PPGLineParser:
+    """批量解析PulseSensor串口输出（见PulseSensor.ino）。
+
+    每行一条记录：'S<值>'为脉搏波采样，'B<值>'为心率，'Q<值>'为心跳间期。
+    feed()把字节追加到持久缓冲区，按换行切分出完整记录，一次性把全部'S'记录
+    转换为浮点数组返回；不完整的最后一行留到下一次。空行忽略，无法解析的记录
+    计入self.malformed。
+    """
+
+    def __init__(self, max_line=64):
+        self.buffer = bytearray()
+        self.max_line = max_line
+        self.samples = 0
+        self.malformed = 0
+        self.bpm = None
+        self.ibi = None
+
+    def feed(self, data):
+        self.buffer += data
+        end = self.buffer.rfind(b'\n')
+        if end < 0:
+            if len(self.buffer) > self.max_line:
+                # 长时间没有换行，说明线路上是垃圾数据
+                self.malformed += 1
+                self.buffer.clear()
+            return np.empty(0)
+        lines = bytes(self.buffer[:end]).split(b'\n')
+        del self.buffer[:end + 1]
+
+        samples = []
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            tag = line[:1]
+            if tag == b'S':
+                samples.append(line[1:])
+            elif tag in (b'B', b'Q'):
+                try:
+                    value = int(line[1:])
+                except ValueError:
+                    self.malformed += 1
+                    continue
+                if tag == b'B':
+                    self.bpm = value
+                else:
+                    self.ibi = value
+            else:
+                self.malformed += 1
+        if not samples:
+            return np.empty(0)
+        try:
+            values = np.array(samples).astype(np.float64)
+        except ValueError:
+            # 有坏记录时逐条解析，只丢弃坏的
+            good = []
+            for sample in samples:
+                try:
+                    good.append(float(sample))
+                except ValueError:
+                    self.malformed += 1
+            values = np.array(good, dtype=np.float64)
+        self.samples += len(values)
+        return values
@@ -0,0 +1,235 @@
+import json
+import os
+import sys
+import threading
+import time
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "TransRR"))
+from preprocessing import FS, preprocess_record, sliding_windows
+from vmd import vmd_remove_last_windows
+
+# 每个采样一条定长记录：时间（相对会话开始的秒数）+ 数值，12字节
+RECORD_DTYPE = np.dtype([('t', '<f8'), ('v', '<f4')])
+CHUNK_SIZE = 4096  # 每块记录数，索引中每块一项（块内第一条记录的时间）
+
+# 默认通道：ECG/PPG原始采样，ADS1292R给出的心率和呼吸频率，TransRR的呼吸频率估计
+# （ads1292r.ino中RESP呼吸算法被注释掉，设备给出的rr恒为0，不能作为训练标签）
+CHANNELS = {'ecg': 125, 'ppg': 50, 'hr': None, 'rr': None, 'rr_pred': None}
+
+
+class ChannelWriter:
+    """一个通道的只追加文件<name>.bin（RECORD_DTYPE记录）和块索引<name>.idx（每块起始时间，float64）。
+
+    记录先写入一个块大小的暂存数组，写满一块才写文件，flush()写出不完整的块。
+    第k块固定是第k*chunk_size条起的记录，与写文件的时机无关，因此索引只需记录时间。
+    """
+
+    def __init__(self, path, chunk_size=CHUNK_SIZE):
+        self.data = open(path + ".bin", "ab")
+        self.index = open(path + ".idx", "ab")
+        self.chunk_size = chunk_size
+        self.count = self.data.tell() // RECORD_DTYPE.itemsize  # 续写已有文件
+        self.staged = np.zeros(chunk_size, dtype=RECORD_DTYPE)
+        self.n_staged = 0
+        self.lock = threading.Lock()
+
+    def write(self, t, v):
+        t = np.atleast_1d(np.asarray(t, dtype=np.float64))
+        v = np.atleast_1d(np.asarray(v, dtype=np.float32))
+        t = np.broadcast_to(t, v.shape)
+        with self.lock:
+            # 新块的起始时间
+            first = (-self.count) % self.chunk_size
+            starts = t[first::self.chunk_size]
+            if len(starts):
+                self.index.write(starts.astype('<f8').tobytes())
+            pos = 0
+            while pos < len(v):
+                n = min(len(v) - pos, self.chunk_size - self.n_staged)
+                self.staged['t'][self.n_staged:self.n_staged + n] = t[pos:pos + n]
+                self.staged['v'][self.n_staged:self.n_staged + n] = v[pos:pos + n]
+                self.n_staged += n
+                pos += n
+                if self.n_staged == self.chunk_size:
+                    self._write_staged()
+            self.count += len(v)
+
+    def _write_staged(self):
+        self.data.write(self.staged[:self.n_staged].tobytes())
+        self.n_staged = 0
+
+    def flush(self):
+        with self.lock:
+            if self.n_staged:
+                self._write_staged()
+            self.data.flush()
+            self.index.flush()
+
+    def close(self):
+        self.flush()
+        self.data.close()
+        self.index.close()
+
+
+class SessionRecorder:
+    """把一次监测会话的各通道写入root/<session>/，meta.json记录采样率、块大小和开始时间。
+
+    时间戳为time.monotonic()，保存为相对会话开始的秒数；wall_start是对应的time.time()。
+    subscribe_to(acquisition)把ECG/PPG批次直接写入（在采集线程中，只做数组拷贝）。
+    """
+
+    def __init__(self, root, session=None, channels=CHANNELS, chunk_size=CHUNK_SIZE, flush_interval=1.0):
+        self.session = session or time.strftime("%Y%m%d_%H%M%S")
+        self.path = os.path.join(root, self.session)
+        os.makedirs(self.path, exist_ok=True)
+        self.channels = dict(channels)
+        meta_path = os.path.join(self.path, "meta.json")
+        if os.path.exists(meta_path):
+            # 续写已有会话：沿用开始时间，新记录的时间接在已有记录之后
+            with open(meta_path) as f:
+                self.wall_start = json.load(f)["wall_start"]
+        else:
+            self.wall_start = time.time()
+        self.t0 = time.monotonic() - (time.time() - self.wall_start)
+        self.writers = {name: ChannelWriter(os.path.join(self.path, name), chunk_size) for name in self.channels}
+        self.last_t = {name: -np.inf for name in self.channels}
+        with open(meta_path, "w") as f:
+            json.dump({"session": self.session, "wall_start": self.wall_start, "chunk_size": chunk_size,
+                       "record_dtype": RECORD_DTYPE.descr, "channels": self.channels}, f, indent=1)
+        self.flush_interval = flush_interval
+        self.last_flush = self.t0
+
+    def write(self, channel, values, t=None):
+        # t: 每个采样的monotonic时间，或一批的到达时间（有采样率时按采样率回推）
+        values = np.atleast_1d(values)
+        if t is None:
+            t = time.monotonic()
+        t = np.asarray(t, dtype=np.float64)
+        fs = self.channels[channel]
+        if t.ndim == 0 and fs:
+            t = t - np.arange(len(values))[::-1] / fs
+        # 回推的时间可能早于上一批的最后一个采样，截断以保证每个通道时间单调（回放时二分查找）
+        t = np.maximum(np.broadcast_to(t, values.shape), self.last_t[channel])
+        self.last_t[channel] = t[-1]
+        self.writers[channel].write(t - self.t0, values)
+        now = time.monotonic()
+        if now - self.last_flush > self.flush_interval:
+            self.last_flush = now
+            self.flush()
+
+    def write_ads1292r(self, name, frames, t):
+        # frames: (n, 4) int16，列依次为ecg, resp, rr, hr；心率和呼吸频率每批记录一次
+        self.write('ecg', frames[:, 0], t)
+        self.write('rr', frames[-1, 2], t)
+        self.write('hr', frames[-1, 3], t)
+
+    def write_ppg(self, name, values, t):
+        self.write('ppg', values, t)
+
+    def subscribe_to(self, acquisition, ecg='ecg', ppg='ppg'):
+        acquisition.subscribe(self.write_ads1292r, ecg)
+        acquisition.subscribe(self.write_ppg, ppg)
+
+    def flush(self):
+        for writer in self.writers.values():
+            writer.flush()
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+
+
+class SessionReader:
+    """内存映射回放：read(channel, t_start, t_end)返回该时间段的记录视图（不复制、不读入整个文件）。
+
+    先在块索引中二分定位到块，再只在这几块内二分，访问的页数与录制时长无关。
+    录制中的会话也可以打开（只映射已写入的完整记录）。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.channels = self.meta["channels"]
+        self.chunk_size = self.meta["chunk_size"]
+
+    def records(self, channel):
+        path = os.path.join(self.path, channel + ".bin")
+        n = os.path.getsize(path) // RECORD_DTYPE.itemsize
+        if n == 0:
+            return np.zeros(0, dtype=RECORD_DTYPE)
+        return np.memmap(path, dtype=RECORD_DTYPE, mode="r", shape=(n,))
+
+    def chunk_index(self, channel):
+        path = os.path.join(self.path, channel + ".idx")
+        n = os.path.getsize(path) // 8
+        return np.fromfile(path, dtype='<f8', count=n)
+
+    def _search(self, records, index, t, side):
+        if len(records) == 0:
+            return 0
+        index = index[:-(-len(records) // self.chunk_size)]  # 只用已写入文件的块
+        chunk = max(np.searchsorted(index, t, side=side) - 1, 0)
+        lo = chunk * self.chunk_size
+        hi = min(lo + 2 * self.chunk_size, len(records))
+        return lo + int(np.searchsorted(records['t'][lo:hi], t, side=side))
+
+    def read(self, channel, t_start=None, t_end=None):
+        records = self.records(channel)
+        index = self.chunk_index(channel)
+        begin = 0 if t_start is None else self._search(records, index, t_start, 'left')
+        end = len(records) if t_end is None else self._search(records, index, t_end, 'left')
+        return records[begin:end]
+
+    def duration(self):
+        ends = [r['t'][-1] for r in (self.records(c) for c in self.channels) if len(r)]
+        return float(max(ends)) if ends else 0.0
+
+
+def list_sessions(root):
+    if not os.path.isdir(root):
+        return []
+    return sorted(name for name in os.listdir(root) if os.path.exists(os.path.join(root, name, "meta.json")))
+
+
+def training_windows(reader, t_start=None, t_end=None, fs=FS, win_sec=16, hop_sec=2, *, label, use_vmd=True, K=4):
+    """把一段录制的ECG/PPG切成TransRR训练窗口：fs采样率、带通滤波、z-score，use_vmd时再对每个窗口做VMD去掉最高频模态。
+
+    label为参考呼吸频率通道（如用SessionRecorder额外录制的呼吸带/CO2通道），必须显式给出；
+    设备的'rr'通道恒为0，不能使用。通道不存在、没有记录或为常数时抛出ValueError。
+    与训练CSV（build_dataset.py默认的README顺序）和在线推理的区别：
+      - 带通滤波是因果的（与在线推理相同），训练CSV用零相位滤波；
+      - z-score由preprocess_record对所选时间段一次算出，即用整段的均值/方差归一化，而在线推理逐块累计，
+        开头的窗口会不同（见preprocessing.RunningZScore）；训练CSV在整段VMD之后做z-score；
+      - VMD按窗口做（与在线推理和build_dataset --live-order相同），训练CSV对整段信号做VMD；
+      - 不做RR范围筛选。
+
+    返回(x1, x2, rr, t_end)：x1/x2为(n, win_sec*fs)，rr为每个窗口内label通道的平均值，t_end为窗口结束时间。
+    只读取所选时间段的记录。
+    """
+    if label not in reader.channels:
+        raise ValueError(f"session has no label channel {label!r} (channels: {sorted(reader.channels)})")
+    ecg = reader.read('ecg', t_start, t_end)
+    ppg = reader.read('ppg', t_start, t_end)
+    if len(ecg) == 0 or len(ppg) == 0:
+        return None
+    begin = max(ecg['t'][0], ppg['t'][0])
+    end = min(ecg['t'][-1], ppg['t'][-1])
+    labels = reader.read(label, begin, end)
+    if len(labels) == 0:
+        raise ValueError(f"label channel {label!r} has no records in the selected time range")
+    if np.all(labels['v'] == labels['v'][0]):
+        raise ValueError(f"label channel {label!r} is constant ({labels['v'][0]:g}), not a reference RR")
+    grid = begin + np.arange(int((end - begin) * fs)) / fs
+    win_size, hop_size = int(win_sec * fs), int(hop_sec * fs)
+    if len(grid) < win_size:
+        return None
+    x1 = sliding_windows(preprocess_record(np.interp(grid, ecg['t'], ecg['v'])), win_size, hop_size)
+    x2 = sliding_windows(preprocess_record(np.interp(grid, ppg['t'], ppg['v'])), win_size, hop_size)
+    if use_vmd:
+        x1 = vmd_remove_last_windows(x1, K=K)[0]
+        x2 = vmd_remove_last_windows(x2, K=K)[0]
+    t_win = sliding_windows(grid, win_size, hop_size)
+    rr = np.interp(t_win, labels['t'], labels['v']).mean(axis=1)
+    return x1, x2, rr, t_win[:, -1]
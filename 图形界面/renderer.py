@@ -0,0 +1,56 @@
+import time
+
+
+class BlitRenderer:
+    """只重绘波形曲线的Matplotlib渲染器。
+
+    标题、坐标轴、刻度等静态部分在完整重绘（首次显示、窗口缩放）时缓存为背景，
+    之后每帧只恢复背景并重画各条Line2D，再blit到画布，开销远小于draw_idle()。
+    同时统计每帧耗时和实际帧率。
+    """
+
+    def __init__(self, canvas, lines):
+        self.canvas = canvas
+        self.figure = canvas.figure
+        self.lines = lines
+        for line in lines:
+            line.set_animated(True)  # 不参与完整重绘，避免被缓存进背景
+        self.background = None
+        self.canvas.mpl_connect('draw_event', self.on_draw)
+
+        # 帧耗时统计
+        self.frames = 0
+        self.frame_time = 0.0  # 最近一帧耗时（秒）
+        self.fps = 0.0
+        self.window_start = time.perf_counter()
+        self.window_frames = 0
+
+    def on_draw(self, event):
+        self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self.draw_lines()
+
+    def draw_lines(self):
+        for line in self.lines:
+            self.figure.draw_artist(line)
+
+    def render(self):
+        start = time.perf_counter()
+        if self.background is None:
+            self.canvas.draw()  # 触发draw_event并缓存背景
+        else:
+            self.canvas.restore_region(self.background)
+            self.draw_lines()
+            self.canvas.blit(self.figure.bbox)
+        end = time.perf_counter()
+
+        self.frames += 1
+        self.frame_time = end - start
+        self.window_frames += 1
+        if end - self.window_start >= 1.0:
+            self.fps = self.window_frames / (end - self.window_start)
+            self.window_start = end
+            self.window_frames = 0
+
+    def invalidate(self):
+        # 静态部分有变化时丢弃背景，下一帧完整重绘
+        self.background = None
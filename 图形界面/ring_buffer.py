@@ -0,0 +1,63 @@
+import time
+import numpy as np
+
+
+class SampleRingBuffer:
+    """单生产者/单消费者（可多个只读消费者）的带时间戳环形缓冲区。
+
+    只有采集线程调用append()：先写入数据和时间戳，最后才更新self.count
+    （单次属性赋值，在GIL下是原子的），因此读者看到的count之前的采样都已写完，
+    无需加锁。last()/since()返回两个切片组成的视图（环绕处一分为二），不做np.roll
+    也不复制。视图在生产者写满一圈之前有效，容量应比读者一次取的长度大得多。
+    """
+
+    def __init__(self, capacity, fs=None, dtype=np.float64):
+        self.capacity = capacity
+        self.fs = fs  # 标称采样率，用于给同一批到达的采样回推时间戳
+        self.values = np.zeros(capacity, dtype=dtype)
+        self.timestamps = np.zeros(capacity)
+        self.count = 0  # 累计写入的采样数
+
+    def append(self, values, timestamps=None):
+        values = np.atleast_1d(values)
+        n = len(values)
+        if n == 0:
+            return
+        if timestamps is None:
+            now = time.monotonic()
+            if self.fs:
+                timestamps = now - np.arange(n)[::-1] / self.fs
+            else:
+                timestamps = np.full(n, now)
+        timestamps = np.broadcast_to(timestamps, (n,))
+        if n > self.capacity:
+            values, timestamps = values[-self.capacity:], timestamps[-self.capacity:]
+        count = self.count + n
+        start = (count - len(values)) % self.capacity
+        first = min(len(values), self.capacity - start)
+        self.values[start:start + first] = values[:first]
+        self.timestamps[start:start + first] = timestamps[:first]
+        self.values[:len(values) - first] = values[first:]
+        self.timestamps[:len(values) - first] = timestamps[first:]
+        self.count = count
+
+    def _slices(self, begin, end):
+        # 绝对采样序号[begin, end)对应的一个或两个切片
+        start = begin % self.capacity
+        n = end - begin
+        if start + n <= self.capacity:
+            return [slice(start, start + n)]
+        return [slice(start, self.capacity), slice(0, start + n - self.capacity)]
+
+    def since(self, begin, end=None):
+        """返回(实际起始序号, 数据视图列表, 时间戳视图列表)，已被覆盖的采样会跳过。"""
+        end = self.count if end is None else end
+        begin = max(begin, end - self.capacity, 0)
+        parts = self._slices(begin, end)
+        return begin, [self.values[s] for s in parts], [self.timestamps[s] for s in parts]
+
+    def last(self, n):
+        """最近n个采样（不足n个时返回全部）的数据视图和时间戳视图。"""
+        end = self.count
+        _, values, timestamps = self.since(max(0, end - n), end)
+        return values, timestamps
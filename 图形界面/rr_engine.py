@@ -0,0 +1,172 @@
+import os
+import sys
+import threading
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "TransRR"))
+from preprocessing import StreamResampler, StreamingBandpass, RunningZScore, SlidingWindower
+from vmd import StreamingVMD
+
+
+class ChannelPipeline:
+    """单通道增量预处理：重采样到fs -> 因果带通滤波 -> 累计z-score -> 重叠窗口 -> （use_vmd时）VMD去掉最高频模态。
+
+    训练数据（build_dataset.py、recorder.training_windows）都做了VMD，所以默认use_vmd=True。
+    VMD只对送入模型的窗口做（finish()），积压后被丢弃的窗口不分解；中心频率沿用上一个窗口的结果作为初值。
+    """
+
+    def __init__(self, fs, t0, win_size, hop_size, use_vmd=True, K=4):
+        self.resampler = StreamResampler(fs, t0)
+        self.bandpass = StreamingBandpass(fs)
+        self.zscore = RunningZScore()
+        self.vmd = StreamingVMD(K=K) if use_vmd else None
+        self.win_size = win_size
+        self.hop_size = hop_size
+        self.windower = None
+
+    def process(self, t, x):
+        start, y = self.resampler.process(t, x)
+        if len(y) == 0:
+            return
+        y = self.zscore.process(self.bandpass.process(y))
+        if self.windower is None:
+            self.windower = SlidingWindower(self.win_size, self.hop_size, start_index=start)
+        yield from self.windower.push(y)
+
+    def finish(self, window):
+        return window if self.vmd is None else self.vmd.process(window)
+
+
+class RRInferenceEngine:
+    """在后台线程中对实时ECG/PPG做滑动窗口呼吸频率预测。
+
+    从两路SampleRingBuffer（由采集线程写入）读取带时间戳的原始采样，工作线程把新采样增量送入ChannelPipeline
+    （重采样到fs(125Hz)、带通滤波、z-score），每隔hop_sec秒得到一个win_sec秒窗口，
+    use_vmd时做VMD（与训练数据一致），再1/down_sampling_grade下采样后送入TransRR模型。
+    Tk主循环只读取self.result，不会被推理阻塞。
+    """
+
+    def __init__(self, ecg_buffer, ppg_buffer, predict_fn=None, model_path=None, fs=125, win_sec=16, hop_sec=2,
+                 down_sampling_grade=8, on_result=None, use_vmd=True):
+        self.buffers = {'ecg': ecg_buffer, 'ppg': ppg_buffer}
+        self.predict_fn = predict_fn
+        self.model_path = model_path
+        self.fs = fs
+        self.win_sec = win_sec
+        self.hop_sec = hop_sec
+        self.down_sampling_grade = down_sampling_grade
+        self.on_result = on_result
+        self.use_vmd = use_vmd
+        self.win_size = int(fs * win_sec)
+        self.hop_size = int(fs * hop_sec)
+        self.pipelines = None
+        self.t0 = None
+        self.consumed = {'ecg': 0, 'ppg': 0}
+        self.windows = {'ecg': {}, 'ppg': {}}
+
+        self.result = None  # (时间戳, 呼吸频率)
+        self.error = None  # 最近一次加载模型/推理失败的原因，成功预测后清除（界面显示）
+        self.failed_windows = 0
+        self.is_running = False
+        self.wakeup = threading.Event()
+        self.thread = None
+
+    def _drain(self, channel):
+        # 取出上次之后新写入的采样（被覆盖的旧采样直接跳过）
+        begin, values, timestamps = self.buffers[channel].since(self.consumed[channel])
+        self.consumed[channel] = begin + sum(len(v) for v in values)
+        return np.concatenate(timestamps), np.concatenate(values)
+
+    def start(self):
+        if self.is_running:
+            return
+        self.is_running = True
+        self.wakeup.clear()
+        self.pipelines = None
+        self.windows = {'ecg': {}, 'ppg': {}}
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.is_running = False
+        self.wakeup.set()
+        if self.thread is not None:
+            self.thread.join(timeout=1)
+            self.thread = None
+
+    def _load_model(self):
+        # 在工作线程中加载模型，避免拖慢界面启动；.tflite只需tflite_runtime，不加载keras
+        if self.model_path.endswith('.tflite'):
+            from predictor import TransRRPredictor
+            return TransRRPredictor(self.model_path)
+        import keras
+        model = keras.models.load_model(self.model_path, compile=False)
+        return lambda x1, x2: np.asarray(model([x1, x2], training=False))
+
+    def _run(self):
+        if self.predict_fn is None:
+            try:
+                self.predict_fn = self._load_model()
+            except Exception as e:
+                # 模型缺失或损坏：记录原因后结束，只显示波形
+                self.error = f"model load failed: {e}"
+                print(f"RRInferenceEngine: {self.error}")
+                self.is_running = False
+                return
+        while self.is_running:
+            self.wakeup.wait(self.hop_sec / 4)
+            if not self.is_running:
+                break
+            try:
+                window = self.next_window()
+                if window is None:
+                    continue
+                t_end, x1, x2 = window
+                rr = float(np.squeeze(self.predict_fn(x1[None, :, None], x2[None, :, None])))
+            except Exception as e:
+                # 单个窗口失败时跳过该窗口，线程继续运行
+                self.failed_windows += 1
+                self.error = f"inference failed: {e}"
+                print(f"RRInferenceEngine: {self.error}")
+                continue
+            if np.isnan(rr):
+                continue  # 推理服务繁忙或不可达时丢弃该窗口，保留上一次结果
+            self.error = None
+            self.result = (t_end, rr)
+            if self.on_result is not None:
+                self.on_result(t_end, rr)
+
+    def next_window(self):
+        if self.pipelines is None:
+            # 两路都有数据后，以较晚开始的一路为共同的时间网格起点
+            if self.buffers['ecg'].count == 0 or self.buffers['ppg'].count == 0:
+                return None
+            starts = []
+            for channel, buffer in self.buffers.items():
+                begin, _, timestamps = buffer.since(0)
+                self.consumed[channel] = begin
+                starts.append(timestamps[0][0])
+            t0 = max(starts)
+            self.pipelines = {channel: ChannelPipeline(self.fs, t0, self.win_size, self.hop_size, self.use_vmd)
+                              for channel in ('ecg', 'ppg')}
+            self.t0 = t0
+
+        for channel, pipeline in self.pipelines.items():
+            t, x = self._drain(channel)
+            for end, window in pipeline.process(t, x):
+                self.windows[channel][end] = window.copy()
+            # 另一路长时间没有数据时，不让积压窗口无限增长
+            if len(self.windows[channel]) > self.win_size // self.hop_size:
+                del self.windows[channel][min(self.windows[channel])]
+
+        # 只对两路都已就绪的最新窗口做预测，丢弃更早的积压窗口
+        common = set(self.windows['ecg']) & set(self.windows['ppg'])
+        if not common:
+            return None
+        end = max(common)
+        # VMD在全采样率窗口上做（与训练数据相同），之后再下采样
+        x1 = self.pipelines['ecg'].finish(self.windows['ecg'][end])[::self.down_sampling_grade]
+        x2 = self.pipelines['ppg'].finish(self.windows['ppg'][end])[::self.down_sampling_grade]
+        for channel in ('ecg', 'ppg'):
+            self.windows[channel] = {k: v for k, v in self.windows[channel].items() if k > end}
+        return self.t0 + end / self.fs, x1, x2
@@ -0,0 +1,216 @@
+"""串口模拟器与吞吐测试。
+
+用伪终端(pty)代替两块Arduino：一个端口按ads1292r.ino的格式发送ADS1292R数据包，
+另一个按PulseSensor.ino的格式发送'S<值>'行，速率可配置，数据可以是合成波形，
+也可以回放BIDMC/CapnoBase训练CSV中的ECG/PPG。
+
+    python serial_sim.py                    # 打印两个pty端口名，供show_signal.py连接
+    python serial_sim.py --csv data.csv     # 回放CSV
+    python serial_sim.py --bench 60         # 无界面测试：采样率、丢包和串口到RR估计的延迟
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+import tty
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "TransRR"))
+from parsers import ADS1292RParser, PPGLineParser, PKT_START_1, PKT_START_2, PKT_STOP, PKT_TYPE_DATA
+from ring_buffer import SampleRingBuffer
+from rr_engine import RRInferenceEngine
+from acquisition import AcquisitionCore, SerialSource
+from dataset_cache import cache_paths
+from make_dataset import load_csv
+
+DATA_LEN = 9
+
+
+def encode_ads1292r(ecg, resp, rr, hr):
+    """把n个采样编码为n个ADS1292R数据包（与ads1292r.ino的sendDataThroughUART一致）。"""
+    n = len(ecg)
+    packets = np.zeros((n, 5 + DATA_LEN + 2), dtype=np.uint8)
+    packets[:, :5] = [PKT_START_1, PKT_START_2, DATA_LEN, 0, PKT_TYPE_DATA]
+    fields = np.stack([ecg, resp, np.broadcast_to(rr, (n,)), np.broadcast_to(hr, (n,))], axis=1)
+    packets[:, 5:13] = fields.astype('<i2').view(np.uint8).reshape(n, 8)
+    packets[:, -1] = PKT_STOP
+    return packets.tobytes()
+
+
+def encode_ppg(values):
+    return b''.join(b'S%d\r\n' % v for v in np.asarray(values, dtype=int))
+
+
+def synthetic_signals(seconds, ecg_rate, ppg_rate, rr=15.0, hr=72.0):
+    """呼吸调制的合成ECG/PPG。"""
+    resp_f = rr / 60.0
+    t_ecg = np.arange(int(seconds * ecg_rate)) / ecg_rate
+    phase = (t_ecg * hr / 60.0) % 1.0
+    ecg = 800 * np.exp(-((phase - 0.3) / 0.02) ** 2) * (1 + 0.2 * np.sin(2 * np.pi * resp_f * t_ecg))
+    t_ppg = np.arange(int(seconds * ppg_rate)) / ppg_rate
+    ppg = 512 + 150 * np.sin(2 * np.pi * hr / 60.0 * t_ppg) + 60 * np.sin(2 * np.pi * resp_f * t_ppg)
+    return ecg, ppg
+
+
+def replay_signals(csv_path, win_size, ecg_rate, ppg_rate, hop_size=250):
+    """把训练CSV中连续的重叠窗口拼回连续信号（每行取前hop_size个采样），按需重采样。
+
+    有build_dataset.py/load_csv写出的.npy缓存时直接内存映射读取，否则解析CSV（并写缓存）。
+    """
+    data_path, _ = cache_paths(csv_path)
+    if os.path.exists(data_path) and os.path.getmtime(data_path) >= os.path.getmtime(csv_path):
+        data = np.load(data_path, mmap_mode="r")
+    else:
+        _, data = load_csv(win_size, csv_path)
+    ecg = np.asarray(data[:, :hop_size]).ravel()
+    ppg = np.asarray(data[:, win_size:win_size + hop_size]).ravel()
+    t = np.arange(len(ecg)) / 125.0
+    ecg = np.interp(np.arange(0, t[-1], 1.0 / ecg_rate), t, ecg) * 1000
+    ppg = 512 + np.interp(np.arange(0, t[-1], 1.0 / ppg_rate), t, ppg) * 100
+    return ecg, ppg
+
+
+class PtyStreamer:
+    """一个pty端口：后台线程按rate发送样本，读端太慢导致写满时丢弃（模拟UART溢出）。"""
+
+    def __init__(self, values, rate, encode, tick=0.01):
+        self.master, slave = os.openpty()
+        tty.setraw(slave)
+        self.port = os.ttyname(slave)
+        self.slave = slave
+        os.set_blocking(self.master, False)
+        self.values = values
+        self.rate = rate
+        self.encode = encode
+        self.tick = tick
+        self.sent = 0  # 已发送的采样数
+        self.dropped_bytes = 0
+        self.is_running = False
+        self.thread = None
+
+    def start(self):
+        self.is_running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.is_running = False
+        if self.thread is not None:
+            self.thread.join(timeout=1)
+
+    def close(self):
+        self.stop()
+        os.close(self.master)
+        os.close(self.slave)
+
+    def _run(self):
+        start = time.monotonic()
+        while self.is_running:
+            due = int((time.monotonic() - start) * self.rate)
+            if due > self.sent:
+                index = np.arange(self.sent, due) % len(self.values)
+                data = self.encode(self.values[index])
+                try:
+                    written = os.write(self.master, data)
+                except BlockingIOError:
+                    written = 0
+                self.dropped_bytes += len(data) - written
+                self.sent = due
+            time.sleep(self.tick)
+
+
+def ecg_encoder(rr=15, hr=72):
+    return lambda ecg: encode_ads1292r(ecg, np.zeros(len(ecg)), rr, hr)
+
+
+def bench(ecg_stream, ppg_stream, seconds, predict_fn=None, model_path=None):
+    """无界面地按show_signal.py的方式读取两个端口，统计吞吐、丢包和延迟。"""
+    ecg_parser, ppg_parser = ADS1292RParser(), PPGLineParser()
+    ecg_buffer, ppg_buffer = SampleRingBuffer(4096, fs=125), SampleRingBuffer(4096, fs=50)
+    latencies = []
+    engine = RRInferenceEngine(ecg_buffer, ppg_buffer, predict_fn=predict_fn, model_path=model_path,
+                               on_result=lambda t_end, rr: latencies.append(time.monotonic() - t_end))
+    acquisition = AcquisitionCore([SerialSource('ecg', ecg_stream.port, 57600, ecg_parser.feed),
+                                   SerialSource('ppg', ppg_stream.port, 115200, ppg_parser.feed)])
+    acquisition.subscribe(lambda name, frames, t: ecg_buffer.append(frames[:, 0]), 'ecg')
+    acquisition.subscribe(lambda name, values, t: ppg_buffer.append(values), 'ppg')
+
+    acquisition.start()
+    engine.start()
+    ecg_stream.start()
+    ppg_stream.start()
+    start = time.monotonic()
+    time.sleep(seconds)
+    elapsed = time.monotonic() - start
+    # 先停止发送，等读端取完在途数据，再统计丢包
+    ecg_stream.stop()
+    ppg_stream.stop()
+    time.sleep(0.5)
+    engine.stop()
+    acquisition.stop()
+    return {
+        'elapsed': elapsed,
+        'ecg_samples': ecg_buffer.count,
+        'ppg_samples': ppg_buffer.count,
+        'samples_per_s': (ecg_buffer.count + ppg_buffer.count) / elapsed,
+        'ppg_malformed': ppg_parser.malformed,
+        'latencies': np.array(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ADS1292R / PulseSensor serial simulator")
+    parser.add_argument("--ecg-rate", type=float, default=125)
+    parser.add_argument("--ppg-rate", type=float, default=50)
+    parser.add_argument("--csv", help="replay ECG/PPG from a training csv instead of synthetic signals")
+    parser.add_argument("--win-size", type=int, default=125 * 16)
+    parser.add_argument("--bench", type=float, default=0, help="run a headless benchmark for N seconds")
+    parser.add_argument("--model", help="TransRR .tflite/.keras model for the benchmark (default: constant predictor)")
+    args = parser.parse_args()
+
+    if args.csv:
+        ecg, ppg = replay_signals(args.csv, args.win_size, args.ecg_rate, args.ppg_rate)
+    else:
+        ecg, ppg = synthetic_signals(60, args.ecg_rate, args.ppg_rate)
+    ecg_stream = PtyStreamer(ecg, args.ecg_rate, ecg_encoder())
+    ppg_stream = PtyStreamer(ppg, args.ppg_rate, encode_ppg)
+    print("ECG port:", ecg_stream.port)
+    print("PPG port:", ppg_stream.port)
+
+    if not args.bench:
+        ecg_stream.start()
+        ppg_stream.start()
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        ecg_stream.close()
+        ppg_stream.close()
+        return
+
+    predict_fn = None if args.model else (lambda x1, x2: np.full((len(x1), 1), 15.0))
+    result = bench(ecg_stream, ppg_stream, args.bench, predict_fn, args.model)
+    ecg_stream.close()
+    ppg_stream.close()
+
+    dropped_ecg = ecg_stream.sent - result['ecg_samples']
+    dropped_ppg = ppg_stream.sent - result['ppg_samples']
+    print("elapsed: %.1f s" % result['elapsed'])
+    print("ECG: sent %d, received %d, dropped %d packets (%d bytes not written)"
+          % (ecg_stream.sent, result['ecg_samples'], dropped_ecg, ecg_stream.dropped_bytes))
+    print("PPG: sent %d, received %d, dropped %d lines, malformed %d"
+          % (ppg_stream.sent, result['ppg_samples'], dropped_ppg, result['ppg_malformed']))
+    print("sustained: %.1f samples/s" % result['samples_per_s'])
+    latencies = result['latencies']
+    if len(latencies):
+        print("RR estimates: %d, latency p50 %.1f ms, p99 %.1f ms, max %.1f ms"
+              % (len(latencies), 1000 * np.percentile(latencies, 50), 1000 * np.percentile(latencies, 99),
+                 1000 * latencies.max()))
+    else:
+        print("RR estimates: 0 (run longer than one 16 s window)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,32 @@
 import tkinter as tk
 from tkinter import ttk
-import serial
-import struct
 import numpy as np
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.figure import Figure
-import threading
-import queue
 import time
+import os
+import socket
+from rr_engine import RRInferenceEngine
+from parsers import ADS1292RParser, PPGLineParser
+from acquisition import AcquisitionCore, SerialSource
+from recorder import SessionRecorder
+from db_sink import DBSink, DB_PATH
+from ring_buffer import SampleRingBuffer
+from renderer import BlitRenderer
+
+# TransRR模型路径（export.py导出的TFLite优先，其次Keras格式），都不存在时只显示波形不做呼吸频率预测
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model")
+MODEL_PATHS = [os.path.join(MODEL_DIR, name) for name in
+               ("transrr_dynamic.tflite", "transrr_float32.tflite", "transrr.keras")]
+MODEL_PATH = next((path for path in MODEL_PATHS if os.path.exists(path)), None)
+RR_SERVER_URL = None  # 多台设备共用一个推理服务时填写rr_server.py的地址（如"http://192.168.1.10:8500"），本机不加载模型
+RR_SESSION = socket.gethostname()  # 推理服务中区分设备的会话名
+ECG_FS = 125  # ADS1292R采样率（125SPS）
+PPG_FS = 50  # PulseSensor约每20ms发送一个采样
+BUFFER_CAPACITY = 4096  # 每路缓冲区容量（ECG约32s，至少容纳一个16s模型窗口）
+RECORD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recordings")  # 每次Start录制一个会话，None为不录制
+DB_ENABLED = True  # 把设备/模型的呼吸频率批量写入SQLite（db_sink.DB_PATH），主界面“数据库”页查看历史会话
+USE_BLIT = True  # True: 只重绘波形曲线（blit）；False: 每帧draw_idle()完整重绘
 
 
 class ECGPPGMonitor:
@@ -16,39 +35,39 @@ class ECGPPGMonitor:
         master.title("ECG & PPG Monitor")
         master.configure(bg='black')
 
-        # ECG协议参数（保持不变）
-        self.CES_CMDIF_PKT_START_1 = 0x0A
-        self.CES_CMDIF_PKT_START_2 = 0xFA
-        self.CES_CMDIF_PKT_STOP = 0x0B
-        self.CES_CMDIF_IND_LEN = 2
-        self.CES_CMDIF_IND_LEN_MSB = 3
-        self.CES_CMDIF_IND_PKTTYPE = 4
-        self.CES_CMDIF_PKT_OVERHEAD = 5
-
-        # 状态变量（保持不变）
-        self.pc_rx_state = 0
-        self.CES_Pkt_Len = 0
-        self.CES_Pkt_Pos_Counter = 0
-        self.CES_Data_Counter = 0
-        self.CES_Pkt_PktType = 0
-        self.CES_Pkt_Data_Counter = bytearray(1000)
-
-        # 数据缓冲区（保持不变）
+        # ECG数据包解析器（批量解析，保留不完整的包）
+        self.ecg_parser = ADS1292RParser()
+        # PPG行解析器（批量解析'S<值>'记录，统计坏记录数）
+        self.ppg_parser = PPGLineParser()
+
+        # 数据缓冲区：每路一个带时间戳的环形缓冲区，绘图显示最近window_size个采样
         self.window_size = 500
         self.xdata = np.arange(self.window_size)
-        self.ecg_data = np.zeros(self.window_size)
-        self.ppg_data = np.zeros(self.window_size)
-        self.array_index = 0
+        self.ecg_buffer = SampleRingBuffer(BUFFER_CAPACITY, fs=ECG_FS)
+        self.ppg_buffer = SampleRingBuffer(BUFFER_CAPACITY, fs=PPG_FS)
+        self.ecg_plot = np.zeros(self.window_size)
+        self.ppg_plot = np.zeros(self.window_size)
+        self.plot_from = {'ecg': 0, 'ppg': 0}  # 清屏时的写入位置，之前的采样不再显示
 
         # 创建GUI
         self.create_widgets()
 
-        # 串口相关（保持不变）
-        self.ecg_ser = None
-        self.ppg_ser = None
-        self.data_queue = queue.Queue()
+        # 串口采集（asyncio事件循环线程，start()时按所选端口创建）
+        self.acquisition = None
+        self.recorder = None
+        self.db_sink = None
+        self.session = None
         self.is_running = False
 
+        # 呼吸频率推理引擎（16s窗口，每2s预测一次）
+        if RR_SERVER_URL is not None:
+            from rr_server import RemotePredictor
+            self.engine = RRInferenceEngine(self.ecg_buffer, self.ppg_buffer,
+                                            predict_fn=RemotePredictor(RR_SERVER_URL, RR_SESSION), hop_sec=2)
+        else:
+            self.engine = RRInferenceEngine(self.ecg_buffer, self.ppg_buffer, model_path=MODEL_PATH, hop_sec=2) \
+                if MODEL_PATH is not None else None
+
     def create_widgets(self):
         # 设置全局样式
         style = ttk.Style()
@@ -130,7 +149,7 @@ class ECGPPGMonitor:
         for spine in self.ax1.spines.values():
             spine.set_color('white')
         self.ax1.set_ylim(-20, 20)
-        self.ecg_line, = self.ax1.plot(self.xdata, self.ecg_data, color='#00FF00', linewidth=1)
+        self.ecg_line, = self.ax1.plot(self.xdata, self.ecg_plot, color='#00FF00', linewidth=1)
 
         # PPG子图设置
         self.ax2 = fig.add_subplot(212)
@@ -140,13 +159,15 @@ class ECGPPGMonitor:
         for spine in self.ax2.spines.values():
             spine.set_color('white')
         self.ax2.set_ylim(0, 1200)
-        self.ppg_line, = self.ax2.plot(self.xdata, self.ppg_data, color='cyan', linewidth=1)
+        self.ppg_line, = self.ax2.plot(self.xdata, self.ppg_plot, color='cyan', linewidth=1)
 
         # 嵌入画布
         self.canvas = FigureCanvasTkAgg(fig, master=self.master)
         self.canvas.get_tk_widget().configure(bg='black')  # 画布控件背景
         self.canvas.draw()
         self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        self.renderer = BlitRenderer(self.canvas, [self.ecg_line, self.ppg_line]) if USE_BLIT else None
+        self.rendered_count = None  # 上一帧绘制时两路的写入位置，没有新采样时跳过该帧
 
         # 状态栏
         status_frame = ttk.Frame(self.master, padding=10)
@@ -156,6 +177,13 @@ class ECGPPGMonitor:
                                   font=('Arial', 12, 'bold'),
                                   foreground='#F0B020')
         self.hr_label.pack(side=tk.LEFT, padx=20)
+        self.rr_label = ttk.Label(status_frame,
+                                  text="Resp Rate: -- brpm",
+                                  font=('Arial', 12, 'bold'),
+                                  foreground='#20B0F0')
+        self.rr_label.pack(side=tk.LEFT, padx=20)
+        self.frame_label = ttk.Label(status_frame, text="", font=('Arial', 9))
+        self.frame_label.pack(side=tk.RIGHT, padx=20)
 
     def refresh_ports(self):
         ports = [f"COM{i + 1}" for i in range(256)]
@@ -169,106 +197,119 @@ class ECGPPGMonitor:
             self.start()
 
     def refresh_line(self):
-        self.ecg_data = np.zeros(self.window_size)
-        self.ppg_data = np.zeros(self.window_size)
-        self.ecg_line.set_ydata(self.ecg_data)
-        self.ppg_line.set_ydata(self.ppg_data)
-        self.canvas.draw_idle()
+        self.plot_from = {'ecg': self.ecg_buffer.count, 'ppg': self.ppg_buffer.count}
+        self.draw_lines(force=True)
 
     def start(self):
+        # 采样批次的订阅者：环形缓冲区在采集线程中写入（推理引擎从中读取），心率标签在Tk线程中更新
+        acquisition = AcquisitionCore([
+            SerialSource('ecg', self.ecg_port_var.get(), int(self.ecg_baud_var.get()), self.ecg_parser.feed),
+            SerialSource('ppg', self.ppg_port_var.get(), int(self.ppg_baud_var.get()), self.ppg_parser.feed)])
+        acquisition.subscribe(self.handle_ads1292r_data, 'ecg')
+        acquisition.subscribe(lambda name, values, t: self.ppg_buffer.append(values), 'ppg')
+        acquisition.subscribe(self.update_vitals, 'ecg', tk=True)
         try:
-            self.ecg_ser = serial.Serial(self.ecg_port_var.get(), int(self.ecg_baud_var.get()), timeout=0.1)
-            self.ppg_ser = serial.Serial(self.ppg_port_var.get(), int(self.ppg_baud_var.get()), timeout=0.1)
-            self.is_running = True
-            self.start_btn.config(text="Stop")
-            threading.Thread(target=self.read_ecg_serial, daemon=True).start()
-            threading.Thread(target=self.read_ppg_serial, daemon=True).start()
-            self.master.after(10, self.update_plot)
+            acquisition.start()
         except Exception as e:
             print(f"Error: {e}")
+            return
+        self.acquisition = acquisition
+        self.session = time.strftime("%Y%m%d_%H%M%S")
+        if RECORD_DIR is not None:
+            # 录制原始ECG/PPG、设备给出的心率/呼吸频率和模型的呼吸频率估计（recorder.SessionReader回放）
+            self.recorder = SessionRecorder(RECORD_DIR, self.session)
+            self.recorder.subscribe_to(acquisition)
+        if DB_ENABLED:
+            self.db_sink = DBSink(DB_PATH)
+            self.db_sink.start_session(self.session, f"{self.ecg_port_var.get()}/{self.ppg_port_var.get()}")
+            self.db_sink.subscribe_to(acquisition, self.session)
+        self.is_running = True
+        self.start_btn.config(text="Stop")
+        if self.engine is not None:
+            self.engine.on_result = self.on_rr_result
+            self.engine.start()
+        self.master.after(10, self.update_plot)
 
     def stop(self):
         self.is_running = False
-        if self.ecg_ser and self.ecg_ser.is_open:
-            self.ecg_ser.close()
-        if self.ppg_ser and self.ppg_ser.is_open:
-            self.ppg_ser.close()
+        if self.engine is not None:
+            self.engine.stop()
+        if self.acquisition is not None:
+            self.acquisition.stop()  # 等读取结束后再关闭串口
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+        if self.db_sink is not None:
+            self.db_sink.end_session(self.session)
+            self.db_sink.close()  # 写入剩余的记录
+            self.db_sink = None
         self.start_btn.config(text="Start")
 
-    def read_ecg_serial(self):
-        while self.is_running and self.ecg_ser.is_open:
-            data = self.ecg_ser.read(1)
-            if data:
-                self.process_ecg_data(data[0])
-
-    def read_ppg_serial(self):
-        while self.is_running and self.ppg_ser.is_open:
-            if self.ppg_ser.in_waiting:
-                line = self.ppg_ser.readline().decode('utf-8').strip()
-                if line[0] == 'S':
-                    try:
-                        val = float(line[1:])
-                        self.ppg_data[self.array_index] = val
-                    except:
-                        pass
-
-    def process_ecg_data(self, rxch):
-        if self.pc_rx_state == 0:  # Init
-            if rxch == self.CES_CMDIF_PKT_START_1:
-                self.pc_rx_state = 1
-        elif self.pc_rx_state == 1:  # SOF1 Found
-            if rxch == self.CES_CMDIF_PKT_START_2:
-                self.pc_rx_state = 2
-            else:
-                self.pc_rx_state = 0
-        elif self.pc_rx_state == 2:  # SOF2 Found
-            self.CES_Pkt_Len = rxch
-            self.CES_Pkt_Pos_Counter = self.CES_CMDIF_IND_LEN
-            self.CES_Data_Counter = 0
-            self.pc_rx_state = 3
-        elif self.pc_rx_state == 3:  # Len Found
-            self.CES_Pkt_Pos_Counter += 1
-            if self.CES_Pkt_Pos_Counter < self.CES_CMDIF_PKT_OVERHEAD:
-                if self.CES_Pkt_Pos_Counter == self.CES_CMDIF_IND_LEN_MSB:
-                    self.CES_Pkt_Len = (rxch << 8) | self.CES_Pkt_Len
-                elif self.CES_Pkt_Pos_Counter == self.CES_CMDIF_IND_PKTTYPE:
-                    self.CES_Pkt_PktType = rxch
-            else:
-                if self.CES_Pkt_PktType == 2:
-                    if self.CES_Data_Counter < len(self.CES_Pkt_Data_Counter):
-                        self.CES_Pkt_Data_Counter[self.CES_Data_Counter] = rxch
-                        self.CES_Data_Counter += 1
-                if self.CES_Pkt_Pos_Counter >= self.CES_CMDIF_PKT_OVERHEAD + self.CES_Pkt_Len + 1:
-                    if rxch == self.CES_CMDIF_PKT_STOP:
-                        self.handle_ads1292r_data()
-                    self.pc_rx_state = 0
-
     def update_plot(self):
-        while not self.data_queue.empty():
-            ecg, resp, hr, rr = self.data_queue.get()
-            self.hr_label.config(text=f"Heart Rate: {hr} bpm")
+        self.acquisition.poll()
+        for name, error in self.acquisition.errors.items():
+            print(f"{name} port error: {error}")
+            self.stop()
+            return
+        if self.engine is not None and self.engine.error is not None:
+            self.rr_label.config(text=f"Resp Rate: -- ({self.engine.error[:40]})")
+        elif self.engine is not None and self.engine.result is not None:
+            self.rr_label.config(text=f"Resp Rate: {self.engine.result[1]:.1f} brpm")
+
+        self.draw_lines()
 
-        #滚动数据
-        self.ecg_line.set_ydata(np.roll(self.ecg_data, -self.array_index))
-        self.ppg_line.set_ydata(np.roll(self.ppg_data, -self.array_index))
-        self.canvas.draw_idle()
+        # 帧耗时和PPG线路质量
+        status = f"PPG bad lines: {self.ppg_parser.malformed}"
+        if self.renderer is not None:
+            status = f"{self.renderer.frame_time * 1000:.1f} ms/frame  {self.renderer.fps:.0f} fps  " + status
+        self.frame_label.config(text=status)
 
         if self.is_running:
             self.master.after(50, self.update_plot)
 
-    def handle_ads1292r_data(self):
-        # 解析ADS1292R数据包
-        ecg_raw = struct.unpack('<h', self.CES_Pkt_Data_Counter[0:2])[0]
-        resp_raw = struct.unpack('<h', self.CES_Pkt_Data_Counter[2:4])[0]
-        rr = struct.unpack('<h', self.CES_Pkt_Data_Counter[4:6])[0]
-        hr = struct.unpack('<h', self.CES_Pkt_Data_Counter[6:8])[0]
-
-        # 更新数据缓冲区
-        self.ecg_data[self.array_index] = ecg_raw
-        self.array_index = (self.array_index + 1) % self.window_size
-
-        # 更新界面显示
-        self.data_queue.put((ecg_raw, resp_raw, hr, rr))
+    def draw_lines(self, force=False):
+        counts = (self.ecg_buffer.count, self.ppg_buffer.count)
+        if counts == self.rendered_count and not force:
+            return  # 没有新采样，跳过这一帧
+        self.rendered_count = counts
+
+        # 从环形缓冲区取最近window_size个采样（两段视图拼接到绘图数组，不做np.roll）
+        self.fill_plot(self.ecg_buffer, self.ecg_plot, 'ecg')
+        self.fill_plot(self.ppg_buffer, self.ppg_plot, 'ppg')
+        self.ecg_line.set_ydata(self.ecg_plot)
+        self.ppg_line.set_ydata(self.ppg_plot)
+        if self.renderer is None:
+            self.canvas.draw_idle()
+            return
+        self.renderer.render()
+
+    def fill_plot(self, buffer, plot, channel):
+        n = min(self.window_size, buffer.count - self.plot_from[channel])
+        values, _ = buffer.last(n)
+        pos = self.window_size - n
+        plot[:pos] = 0
+        for part in values:
+            plot[pos:pos + len(part)] = part
+            pos += len(part)
+
+    def handle_ads1292r_data(self, name, frames, t):
+        # frames: (n, 4) int16，列依次为ecg, resp, rr, hr
+        # 写入ECG缓冲区（同一次读取到的多个采样按采样率回推时间戳）
+        self.ecg_buffer.append(frames[:, 0])
+
+    def on_rr_result(self, t_end, rr):
+        # 在推理线程中执行
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.write('rr_pred', rr, t_end)
+        db_sink = self.db_sink
+        if db_sink is not None:
+            db_sink.add_rr(self.session, t_end, rr)
+
+    def update_vitals(self, name, frames, t):
+        # 在Tk线程中执行：显示最新一帧的心率
+        hr = frames[-1, 3]
+        self.hr_label.config(text=f"Heart Rate: {hr} bpm")
 
 if __name__ == "__main__":
     root = tk.Tk()
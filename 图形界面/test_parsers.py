@@ -0,0 +1,47 @@
+import numpy as np
+from parsers import ADS1292RParser, PPGLineParser, PKT_START_1, PKT_START_2
+from serial_sim import encode_ads1292r, encode_ppg
+
+def _frames(n=50, seed=0):
+    rng = np.random.default_rng(seed)
+    ecg = rng.integers(-3000, 3000, n)
+    ecg[::7] = np.frombuffer(bytes([PKT_START_1, PKT_START_2]), '<i2')[0]  # packet header bytes inside the payload
+    return np.stack([ecg, rng.integers(-100, 100, n), np.full(n, 15), np.full(n, 72)], axis=1).astype(np.int16)
+
+def _feed_all(parser, chunks):
+    out = [parser.feed(chunk) for chunk in chunks]
+    return np.concatenate(out) if out else np.empty(0)
+
+def test_ads1292r_bytewise_equals_bulk():
+    frames = _frames()
+    stream = encode_ads1292r(*frames.T)
+    bulk = ADS1292RParser().feed(stream)
+    bytewise = _feed_all(ADS1292RParser(), [stream[i:i + 1] for i in range(len(stream))])
+    uneven = _feed_all(ADS1292RParser(), [stream[i:i + 13] for i in range(0, len(stream), 13)])
+    np.testing.assert_array_equal(bulk, frames)
+    np.testing.assert_array_equal(bytewise, frames)
+    np.testing.assert_array_equal(uneven, frames)
+
+def test_ads1292r_resyncs_after_garbage():
+    frames = _frames()
+    good = encode_ads1292r(*frames.T)
+    # noise, a header with an implausible length and a packet whose stop byte is wrong
+    broken = bytearray(encode_ads1292r(*frames[:1].T))
+    broken[-1] = 0x00
+    garbage = bytes([1, 2, 3, PKT_START_1, PKT_START_2, 0xFF, 0xFF, 9]) + bytes(broken) + bytes(range(20))
+    parser = ADS1292RParser()
+    out = _feed_all(parser, [good[:160], garbage, good[160:]])
+    np.testing.assert_array_equal(out, frames)
+    assert parser.packets == len(frames)
+    out = _feed_all(ADS1292RParser(), [garbage + good[:3 * 16 + 5], good[3 * 16 + 5:]])
+    np.testing.assert_array_equal(out, frames)
+
+def test_ppg_bytewise_equals_bulk_and_skips_bad_lines():
+    values = np.arange(100) * 7 % 1024
+    stream = encode_ppg(values[:50]) + b"B72\r\nSx1\r\n#junk\r\nQ830\r\n\r\n" + encode_ppg(values[50:])
+    bulk = PPGLineParser()
+    np.testing.assert_array_equal(bulk.feed(stream), values)
+    parser = PPGLineParser()
+    np.testing.assert_array_equal(_feed_all(parser, [stream[i:i + 1] for i in range(len(stream))]), values)
+    assert parser.malformed == bulk.malformed == 2
+    assert (parser.bpm, parser.ibi) == (72, 830)
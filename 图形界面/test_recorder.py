@@ -0,0 +1,55 @@
+import json
+import os
+import numpy as np
+import pytest
+from recorder import ChannelWriter, SessionRecorder, SessionReader, RECORD_DTYPE, CHANNELS, training_windows
+
+def _reader(tmp_path, n=10_000, chunk_size=64):
+    # one ecg channel written in uneven batches, so chunk boundaries fall inside batches
+    os.makedirs(os.path.join(tmp_path, "s"))
+    writer = ChannelWriter(os.path.join(tmp_path, "s", "ecg"), chunk_size)
+    t = np.arange(n) / 125
+    v = np.sin(t).astype(np.float32)
+    for start, stop in zip([0, 1, 70, 500, 4000], [1, 70, 500, 4000, n]):
+        writer.write(t[start:stop], v[start:stop])
+    writer.close()
+    with open(os.path.join(tmp_path, "s", "meta.json"), "w") as f:
+        json.dump({"channels": {"ecg": 125}, "chunk_size": chunk_size}, f)
+    return SessionReader(os.path.join(tmp_path, "s")), t, v
+
+def test_round_trip(tmp_path):
+    reader, t, v = _reader(tmp_path)
+    records = reader.read("ecg")
+    np.testing.assert_array_equal(records["t"], t)
+    np.testing.assert_array_equal(records["v"], v)
+    np.testing.assert_array_equal(reader.chunk_index("ecg"), t[::64])
+    assert records.dtype == RECORD_DTYPE
+
+@pytest.mark.parametrize("t_start, t_end", [(0.0, 1.0), (10.3, 10.31), (0.5115, 33.7), (79.0, 100.0), (5.0, 5.0)])
+def test_time_range_matches_linear_search(tmp_path, t_start, t_end):
+    reader, t, v = _reader(tmp_path)
+    records = reader.read("ecg", t_start, t_end)
+    expected = (t >= t_start) & (t < t_end)
+    np.testing.assert_array_equal(records["t"], t[expected])
+    np.testing.assert_array_equal(records["v"], v[expected])
+
+def test_reopened_writer_continues_chunks(tmp_path):
+    reader, t, v = _reader(tmp_path, n=100)
+    writer = ChannelWriter(os.path.join(tmp_path, "s", "ecg"), 64)
+    writer.write(t[-1] + 1 + np.arange(100) / 125, np.ones(100))
+    writer.close()
+    assert len(reader.read("ecg")) == 200
+    assert len(reader.chunk_index("ecg")) == 4  # chunks start at records 0, 64, 128, 192
+
+def test_training_windows_rejects_device_rr(tmp_path):
+    recorder = SessionRecorder(str(tmp_path), "s", channels=CHANNELS)
+    t = recorder.t0 + np.arange(40 * 125) / 125
+    recorder.write("ecg", np.sin(t), t)
+    recorder.write("ppg", np.sin(t[::2]), t[::2])
+    recorder.write("rr", np.zeros(40), recorder.t0 + np.arange(40))
+    recorder.close()
+    reader = SessionReader(recorder.path)
+    with pytest.raises(ValueError):
+        training_windows(reader, label="rr")
+    with pytest.raises(ValueError):
+        training_windows(reader, label="capno")
@@ -0,0 +1,37 @@
+import numpy as np
+from ring_buffer import SampleRingBuffer
+
+def _joined(parts):
+    return np.concatenate(parts) if parts else np.empty(0)
+
+def test_wrap_around_and_last():
+    buffer = SampleRingBuffer(10)
+    written = np.arange(27, dtype=float)
+    for start, stop in [(0, 4), (4, 11), (11, 12), (12, 27)]:
+        buffer.append(written[start:stop], written[start:stop] / 10)
+    assert buffer.count == 27
+    values, timestamps = buffer.last(10)
+    assert len(values) == 2  # the last 10 samples wrap around the end of the array
+    np.testing.assert_array_equal(_joined(values), written[-10:])
+    np.testing.assert_array_equal(_joined(timestamps), written[-10:] / 10)
+    np.testing.assert_array_equal(_joined(buffer.last(3)[0]), written[-3:])
+
+def test_since_skips_overwritten_samples():
+    buffer = SampleRingBuffer(10)
+    buffer.append(np.arange(8.0), 0.0)
+    begin, values, _ = buffer.since(5)
+    assert begin == 5
+    np.testing.assert_array_equal(_joined(values), [5, 6, 7])
+    buffer.append(np.arange(8.0, 20.0), 1.0)
+    begin, values, timestamps = buffer.since(5)  # samples 5..9 were overwritten
+    assert begin == 10
+    np.testing.assert_array_equal(_joined(values), np.arange(10.0, 20.0))
+    begin, values, _ = buffer.since(buffer.count)
+    assert begin == 20 and len(_joined(values)) == 0
+
+def test_batch_larger_than_capacity_and_fs_timestamps():
+    buffer = SampleRingBuffer(10, fs=100)
+    buffer.append(np.arange(25.0))
+    values, timestamps = buffer.last(10)
+    np.testing.assert_array_equal(_joined(values), np.arange(15.0, 25.0))
+    np.testing.assert_allclose(np.diff(_joined(timestamps)), 0.01)